@@ -7,250 +7,833 @@ Creates a customizable image sequence for the spectrum of an audio file.
 """
 
 from arguments import args, initArgs, processArgs	# Handles arguments
-from styles import renderFrame						# Handles styles
-
-from audio2numpy import open_audio					# Works with several audio formats, including .mp3 (Uses ffmpeg as subroutine)
-from time import time
+from styles import createRenderPlan, renderChunk		# Handles styles
+
+from audio import probeAudio, readPcm, streamAudio	# Decodes audio through ffmpeg
+from shared import attachArray, createArray, releaseArrays, shareArray	# Shares arrays with the render processes
+from progress import attachProgress, startProgress, stopProgress	# Reports the rendering progress
+from cache import BIN_ARGS, SPECTRUM_ARGS, entryKey, fileHash, loadEntry, storeEntry	# Caches the analysis on disk
+from images import WRITER_THREADS, closeImageWriter, createFrameFile, openImageWriter, writeImage	# Writes image sequences
+from pipeline import closeFrameRing, fillSlot, flushRing, openFrameRing, takeSlot	# Overlaps rendering and writing within a render process
+from manifest import loadManifest, markCompleted, removeManifest, renderHash, writeManifest	# Keeps track of finished segments for resuming
+from profiling import finishWorkerProfile, recordChunk, recordParts, stage, startProfile, startWorkerProfile, timeIterator, writeReport	# Profiles the stages of the render
+from time import perf_counter, time
 import numpy as np
-import cv2
+from numpy.lib.stride_tricks import sliding_window_view
 import matplotlib.pyplot as plt
-from os import mkdir, path, remove, rmdir
-from sys import exit, stdout, stderr
+from os import O_WRONLY, devnull, dup2, mkdir, path, remove, replace, rmdir
+from os import open as osOpen
+from sys import exit, stdin, stdout, stderr
 from joblib import Parallel, delayed
 from multiprocessing import Manager
+from queue import Empty
+from types import SimpleNamespace
 import subprocess
+import sys
 
-VID_CODEC = "mp4v"
 VID_EXT = ".mp4"
+SHARED_ARGS = ["radialImage", "radialImageMask", "frameMask"]	# Large read-only arguments that are placed in shared memory for rendering
+ANALYSIS_BLOCKSIZE = 2**23							# Number of samples transformed at once while creating frame data
+SMOOTHING_BLOCKSIZE = 2**18							# Number of bins smoothed at once
+SEEK_MARGIN = 0.5									# Seconds of audio decoded and dropped before the start point, so the decoder is primed
+SEGMENTS_PER_PROCESS = 4							# Number of segments the frames are split into per process, so the work can be balanced
+MAX_SEGMENT_FRAMES = 300							# Maximum number of frames per segment
+PEAK_HALFLIFE = 10									# Seconds after which the running peak of a stream has decayed to half, so it recovers after loud passages
 
 
 """
-Loads audio file.
+Probes the audio file without decoding it.
+Returns the samplerate, the number of channels and the length of the audio in seconds.
 """
 def loadAudio():
 	if args.test:
 		fileData = np.load("testData.npy")
 		samplerate = 44100
-		return fileData, samplerate
+		return samplerate, 1, len(fileData)/samplerate
 	else:
 		if not path.isfile(args.filename):
 			exit("Path to file does not exist.")
 		else:
-			fileData, samplerate = open_audio(args.filename)
-			return fileData, samplerate
+			return probeAudio(args.filename)
 
 
 """
-Processes data from <FILENAME> and assigns data to its respective channels frame.
+Decodes the audio between start and end point, plus half a window after the end point that the analysis window of the last frame may span.
+Decoding starts SEEK_MARGIN seconds before the start point: decoders of compressed formats need some audio before the seek point
+to decode it correctly, and the audio before the start point is dropped by the analysis.
+Returns an iterator over blocks of the audio and the index of its first sample in the file. Decoding happens while the blocks are consumed.
+"""
+def decodeAudio(samplerate, numChannels):
+	if args.test:
+		return [np.load("testData.npy")], 0
+	else:
+		seekStart = max(args.start - SEEK_MARGIN, 0)
+		seekEnd = args.end + args.duration/1000/2
+		audioBlocks = streamAudio(args, args.filename, samplerate, numChannels, seekStart, seekEnd)
+		return audioBlocks, round(seekStart*samplerate)		# ffmpeg rounds the seek point to the nearest sample
+
+
+"""
+Returns the hash of the content of the audio file that its cache entries and the manifests of its renders are keyed by.
 """
-def calculateFrameData(fileData, samplerate):
-	# Chooses what channels to be calculated
-	channels = []
+def audioHash():
+	if args.test:
+		return fileHash("testData.npy")
+	else:
+		return fileHash(args.filename)
+
 
+"""
+Returns the cached result of <stage> for the audio with <contentHash> and the current values of the arguments in <argNames>,
+or None if it is not cached.
+"""
+def loadCached(contentHash, stage, argNames):
+	if contentHash is None:
+		return None
+	return loadEntry(args.cacheDirectory, entryKey(args, contentHash, stage, argNames))
+
+
+"""
+Stores <array> as the result of <stage> in the cache.
+"""
+def storeCached(contentHash, stage, argNames, array):
+	if contentHash is not None:
+		storeEntry(args.cacheDirectory, entryKey(args, contentHash, stage, argNames), array, int(args.cacheSize*1024**2))
+
+
+"""
+Selects the channels to be calculated from <fileData>. Returns an array of shape (channels, samples).
+"""
+def selectChannels(fileData):
 	if len(fileData.shape) > 1:						# Converts multiple channels to single channel
 		if args.channel == "average":
-			channels.append(np.mean(fileData, axis=1))
+			return np.mean(fileData, axis=1)[np.newaxis]
 		elif args.channel == "left":
-			channels.append(fileData[:,0])
+			return fileData[:,0][np.newaxis]
 		elif args.channel == "right":
-			channels.append(fileData[:,1])
+			return fileData[:,1][np.newaxis]
 		else:											# Adds all channels (Stereo, Surround)
-			for i in range(fileData.shape[1]):
-				channels.append(fileData[:,i])
+			return fileData.T
 	else:												# Adds mono channel
-		channels.append(fileData)
+		return fileData[np.newaxis]
+
+
+"""
+Calculates the number of frames for <numSamples> samples of channel data.
+"""
+def countFrames(numSamples, samplerate):
+	stepSize = samplerate/args.framerate
+	return int(np.ceil(numSamples/stepSize))
+
+
+"""
+Calculates the first sample of the analysis window of the frames <frameIndices>, relative to the start point.
+Windows of frames at the edges may start before the data or reach past its end.
+"""
+def frameWindowStarts(frameIndices, samplerate):
+	stepSize = samplerate/args.framerate
+	frameDataMidpoints = stepSize * frameIndices + (stepSize/2)
+	return np.trunc(frameDataMidpoints - (args.duration/1000/2)*samplerate).astype(np.int64)
+
+
+"""
+Gathers the analysis windows starting at <starts> from <channelData> (channels, samples) into one array of shape (channels, frames, windowLength).
+Inbound windows are strided views into the data, windows reaching over the edges are taken from a small zero-padded buffer.
+"""
+def gatherWindows(channelData, starts, windowLength):
+	numSamples = channelData.shape[-1]
+	windows = np.empty((channelData.shape[0], len(starts), windowLength), dtype=channelData.dtype)
+
+	inbound = (starts >= 0) & (starts + windowLength <= numSamples)
+	if np.any(inbound):
+		view = sliding_window_view(channelData, windowLength, axis=-1)
+		windows[:,inbound] = view[:,starts[inbound]]
+
+	leftbound = starts < 0
+	rightbound = ~inbound & ~leftbound
+	for edge in (leftbound, rightbound):
+		if not np.any(edge):
+			continue
+		bufferStart = starts[edge].min()
+		bufferEnd = starts[edge].max() + windowLength
+		paddedData = np.zeros((channelData.shape[0], bufferEnd - bufferStart), dtype=channelData.dtype)
+		dataStart = max(bufferStart, 0)
+		dataEnd = min(bufferEnd, numSamples)
+		paddedData[:,dataStart-bufferStart:dataEnd-bufferStart] = channelData[:,dataStart:dataEnd]
+		view = sliding_window_view(paddedData, windowLength, axis=-1)
+		windows[:,edge] = view[:,starts[edge] - bufferStart]
+
+	return windows
+
+
+"""
+Returns the length of the analysis windows and the range of amplitudes between frequencyStart and frequencyEnd.
+"""
+def frameDataLayout(samplerate):
+	windowLength = int(args.duration/1000 * samplerate)
+	numAmplitudes = windowLength//2 + 1
+	frequencyRange = slice(int(args.frequencyStart/(samplerate/2)*numAmplitudes), int(args.frequencyEnd/(samplerate/2)*numAmplitudes))
+	return windowLength, frequencyRange
+
+
+"""
+Transforms the windows starting at <starts> of <channelData> in blocks of at most ANALYSIS_BLOCKSIZE samples, so peak memory
+is bounded by the block size instead of the length of the audio.
+Yields the amplitudes of every block with shape (channels, frames, freqBins).
+"""
+def transformWindows(channelData, starts, windowLength, frequencyRange):
+	blockFrames = max(1, int(ANALYSIS_BLOCKSIZE/(channelData.shape[0] * windowLength)))
+
+	for firstFrame in range(0, len(starts), blockFrames):
+		windows = gatherWindows(channelData, starts[firstFrame:firstFrame+blockFrames], windowLength)
+
+		# Fourier Transformation (Amplitudes) of all windows at once, sliced to only contain the amplitudes between startFrequency and endFrequency
+		yield np.abs(np.fft.rfft(windows, axis=-1)[...,frequencyRange])
+
+
+"""
+Splits the audio from <audioBlocks> into segments of consecutive frames as it is decoded.
+Samples that are still needed by upcoming analysis windows are carried over to the next block,
+so only about one block and one window of audio are held in memory. <firstSample> is the index of the first decoded sample in the file.
+Yields (firstFrame, channelData, starts): the audio the windows of the segment's frames lie in with shape (channels, samples)
+and the start of every window within it. Windows only reach past the audio at the start and end point, where they are zero-padded.
+"""
+def iterSegments(audioBlocks, samplerate, firstSample=0):
+	windowLength, frequencyRange = frameDataLayout(samplerate)
+	dataStart = int(args.start*samplerate)
+	dataEnd = int(args.end*samplerate)
+
+	carryData = None									# Channel data that is still needed by upcoming frames
+	carryStart = 0										# Position of carryData relative to the start point
+	blockStart = firstSample							# Position of the current block in the file
+	nextFrame = 0
+
+	for block in audioBlocks:
+		blockEnd = blockStart + len(block)
+
+		# Slices block to start and end point
+		channels = selectChannels(block[max(dataStart - blockStart, 0):max(min(dataEnd, blockEnd) - blockStart, 0)])
+		blockStart = blockEnd
+
+		if channels.shape[-1] > 0:
+			if carryData is None:
+				carryData = channels
+			else:
+				carryData = np.concatenate((carryData, channels), axis=-1)
+
+			# All frames whose windows lie completely within the available data
+			available = carryStart + carryData.shape[-1]
+			starts = frameWindowStarts(np.arange(nextFrame, countFrames(available, samplerate)), samplerate)
+			starts = starts[starts + windowLength <= available]
+			if len(starts) > 0:
+				yield nextFrame, carryData, starts - carryStart
+				nextFrame += len(starts)
+
+			# Drops the samples that precede the window of the next frame
+			nextStart = frameWindowStarts(np.array([nextFrame]), samplerate)[0]
+			consumed = min(max(nextStart - carryStart, 0), carryData.shape[-1])
+			carryData = carryData[:,consumed:]
+			carryStart += consumed
+
+		if blockStart >= dataEnd:
+			break
 
-	frameData = []
-	for channel in channels:
+	if carryData is None:
+		return
 
-		# Slices channelData to start and end point
-		channelData = channel[int(args.start*samplerate):int(args.end*samplerate)]
+	# Remaining frames reach past the end of the data
+	available = carryStart + carryData.shape[-1]
+	starts = frameWindowStarts(np.arange(nextFrame, countFrames(available, samplerate)), samplerate)
+	if len(starts) > 0:
+		yield nextFrame, carryData, starts - carryStart
 
-		# Splits data into frames
-		channelFrameData = []
-		stepSize = samplerate/args.framerate
-		for i in range(int(np.ceil(len(channelData)/stepSize))):
-			frameDataMidpoint = stepSize * i + (stepSize/2)
-			frameDataStart = int(frameDataMidpoint - (args.duration/1000/2)*samplerate)
-			frameDataEnd = int(frameDataMidpoint + (args.duration/1000/2)*samplerate)
 
-			if frameDataStart < 0:						# Leftbound data
-				emptyFrame = np.zeros(int(args.duration/1000 * samplerate))
-				currentFrameData = channelData[0:frameDataEnd]
-				emptyFrame[0:len(currentFrameData)] = currentFrameData
-				currentFrameData = emptyFrame
-			elif frameDataEnd > len(channelData):		# Rightbound data
-				emptyFrame = np.zeros(int(args.duration/1000 * samplerate))
-				currentFrameData = channelData[frameDataStart:]
-				emptyFrame[0:len(currentFrameData)] = currentFrameData
-				currentFrameData = emptyFrame
-			else:										# Inbound data
-				currentFrameData = channelData[int(frameDataStart):int(frameDataEnd)]
+"""
+Processes the audio from <audioBlocks> incrementally and yields the amplitudes of its frames.
+Yields (firstFrame, lastFrame, amplitudes) with amplitudes of shape (channels, lastFrame-firstFrame, freqBins).
+"""
+def iterFrameData(audioBlocks, samplerate, firstSample=0):
+	windowLength, frequencyRange = frameDataLayout(samplerate)
+
+	for firstFrame, channelData, starts in iterSegments(audioBlocks, samplerate, firstSample):
+		for amplitudes in transformWindows(channelData, starts, windowLength, frequencyRange):
+			yield firstFrame, firstFrame + amplitudes.shape[1], amplitudes
+			firstFrame += amplitudes.shape[1]
 
-			# Fourier Transformation (Amplitudes)
-			frameDataAmplitudes = abs(np.fft.rfft(currentFrameData))
 
-			# Slices frameDataAmplitudes to only contain the amplitudes between startFrequency and endFrequency
-			frameDataAmplitudes = frameDataAmplitudes[int(args.frequencyStart/(samplerate/2)*len(frameDataAmplitudes)):int(args.frequencyEnd/(samplerate/2)*len(frameDataAmplitudes))]
+"""
+Processes data from <FILENAME> and assigns data to its respective channels frame.
+Returns a float32 array of shape (channels, frames, freqBins).
+"""
+def calculateFrameData(audioBlocks, samplerate, firstSample=0):
+	windowLength, frequencyRange = frameDataLayout(samplerate)
+	numAmplitudes = len(range(windowLength//2 + 1)[frequencyRange])
+	numFrames = countFrames(int(args.end*samplerate) - int(args.start*samplerate), samplerate)
 
-			channelFrameData.append(frameDataAmplitudes)
+	frameData = None
+	lastFrame = 0
+	for firstFrame, lastFrame, amplitudes in iterFrameData(audioBlocks, samplerate, firstSample):
+		if frameData is None:
+			frameData = np.empty((amplitudes.shape[0], numFrames, numAmplitudes), dtype=np.float32)
+		frameData[:,firstFrame:lastFrame] = amplitudes
 
-		#frameData.append(channelFrameData)
-		frameData.append(channelFrameData)
+	if frameData is None:
+		exit("Audio does not contain any samples between start and end time.")
 
-	return frameData
+	return frameData[:,:lastFrame]
+
+
+"""
+Calculates the index table of the bins for a spectrum of <numAmplitudes> amplitudes.
+Returns the start and end index of every bin. The edges only depend on the number of bins, xlog and the spectrum length.
+"""
+def binEdges(numAmplitudes):
+	binIndices = np.arange(args.bins + 1)
+	if args.xlog == 0:
+		edges = (binIndices*numAmplitudes/args.bins).astype(np.int64)
+	else:
+		edges = ((binIndices/args.bins)**args.xlog * numAmplitudes).astype(np.int64)
+
+	dataStarts = edges[:-1]
+	dataEnds = edges[1:].copy()
+	dataEnds[dataEnds == dataStarts] += 1				# Ensures [dataStart:dataEnd] does not result NaN
+	return dataStarts, dataEnds
 
 
 """
 Creates the bins for every channels frame. A bin contains an amplitude that will later be represented as the height of a bar, point, line, etc. on the frame.
+Returns a float32 array of shape (channels, frames, bins).
 """
 def createBins(frameData):
-	bins = []
-	for channel in frameData:
-		channelBins = []
-		for data in channel:
-			frameBins = []
-			for i in range(args.bins):
-				if args.xlog == 0:
-					dataStart = int(i*len(data)/args.bins)
-					dataEnd = int((i+1)*len(data)/args.bins)
-				else:
-					dataStart = int((i/args.bins)**args.xlog * len(data))
-					dataEnd = int(((i+1)/args.bins)**args.xlog * len(data))
-				if dataEnd == dataStart:
-					dataEnd += 1						# Ensures [dataStart:dataEnd] does not result NaN
-				frameBins.append(np.mean(data[dataStart:dataEnd]))
-			channelBins.append(frameBins)
-
-		bins.append(channelBins)
-	
+	dataStarts, dataEnds = binEdges(frameData.shape[-1])
+
+	# A bin either ends where the next one starts or consists of a single amplitude where the next one starts at the same index,
+	# so summing from every start index to the next one yields the sum of every bin.
+	bins = np.add.reduceat(frameData, dataStarts, axis=-1, dtype=np.float32)
+	bins /= (dataEnds - dataStarts).astype(np.float32)
+
 	return bins
 
 
 """
-Smoothes the bins in a frame (Over the past/next n frames).
+Smoothes the bins in a frame (Over the past/next n bins).
+Every bin is averaged with up to <args.smoothY> bins on each side, the window shrinks at the first and last bins.
+Uses a cumulative sum, so the runtime does not depend on the amount of smoothing. The sums are taken in float64 over blocks of
+SMOOTHING_BLOCKSIZE bins, so they stay precise without holding float64 copies of all bins.
+Returns a float32 array of the same shape.
 """
 def smoothBinData(bins):
-	binsSmoothed = []
-	for channel in bins:
-		channelBinsSmoothed = []
-		for frameBinData in channel:
-			smoothedBinData = []
-			for i in range(len(frameBinData)):
-				if i < args.smoothY:						# First n bins
-					smoothedBinData.append(np.mean(frameBinData[:i+args.smoothY+1]))
-				elif i >= len(frameBinData)-args.smoothY:	# Last n bins
-					smoothedBinData.append(np.mean(frameBinData[i-args.smoothY:]))
-				else:										# Normal Case
-					smoothedBinData.append(np.mean(frameBinData[i-args.smoothY:i+args.smoothY+1]))
-			channelBinsSmoothed.append(smoothedBinData)
-
-		binsSmoothed.append(channelBinsSmoothed)
+	numBins = bins.shape[-1]
+	binIndices = np.arange(numBins)
+	windowStarts = np.maximum(binIndices - args.smoothY, 0)
+	windowEnds = np.minimum(binIndices + args.smoothY + 1, numBins)
+
+	binsSmoothed = np.empty(bins.shape, dtype=np.float32)
+	blockFrames = max(1, int(SMOOTHING_BLOCKSIZE/(bins.shape[0] * numBins)))
+	for firstFrame in range(0, bins.shape[1], blockFrames):
+		block = bins[:,firstFrame:firstFrame+blockFrames]
+		cumulativeBins = np.zeros(block.shape[:-1] + (numBins + 1,))
+		np.cumsum(block, axis=-1, out=cumulativeBins[...,1:])
+		np.divide(cumulativeBins[...,windowEnds] - cumulativeBins[...,windowStarts], windowEnds - windowStarts,
+			out=binsSmoothed[:,firstFrame:firstFrame+blockFrames], casting="same_kind")
 
 	return binsSmoothed
 
 
 """
-Creates directory named <args.destination>
-Renders frames from bin data and exports them directly to <args.processes> partial videos
-If args.imageSequence is set, instead exports frames as images into the directory
-Starts at "0.png" for first frame.
+Creates the frame data and bins of the audio from <audioBlocks> across args.processes processes.
+The audio is decoded once and split into segments, each segment is transformed, binned and smoothed by one process,
+which writes its frames directly into shared arrays. A segment is sent along with all samples its windows reach into,
+so the results are bit-identical to the single-process run.
+Returns the bins (channels, frames, bins), the frame data (channels, frames, freqBins) if <keepFrameData> is set or else None,
+and the shared memory blocks holding them, to be released once they are no longer used.
+The seconds all processes spent on the transform, binning and smoothing are added to <timings> if it is given.
 """
-def renderSaveFrames(bins):
-	bins = bins/np.max(bins)							# Normalize vector length to [0,1]
+def analyzeAudio(audioBlocks, samplerate, numChannels, firstSample=0, keepFrameData=False, timings=None):
+	windowLength, frequencyRange = frameDataLayout(samplerate)
+	numAmplitudes = len(range(windowLength//2 + 1)[frequencyRange])
+	numFrames = countFrames(int(args.end*samplerate) - int(args.start*samplerate), samplerate)
+	if args.channel != "stereo":
+		numChannels = 1
+
+	sharedMemory = []
+	outputs = {}
+	shm, bins, outputs["bins"] = createArray((numChannels, numFrames, args.bins), np.float32)
+	sharedMemory.append(shm)
+	if keepFrameData:
+		shm, frameData, outputs["frameData"] = createArray((numChannels, numFrames, numAmplitudes), np.float32)
+		sharedMemory.append(shm)
+	else:
+		frameData = None
+
+	# Large arguments are not needed for the analysis and would otherwise be pickled along with args for every segment
+	largeArgs = {key: getattr(args, key) for key in SHARED_ARGS if hasattr(args, key)}
+	for key in largeArgs:
+		setattr(args, key, None)
+
+	try:
+		results = Parallel(n_jobs=args.processes)(delayed(analyzeSegment)(args, firstFrame, segmentData, segmentStarts, samplerate, outputs)
+			for firstFrame, segmentData, segmentStarts in trimSegments(iterSegments(audioBlocks, samplerate, firstSample), windowLength))
+	except BaseException:
+		releaseArrays(sharedMemory)
+		raise
+	finally:
+		for key, value in largeArgs.items():
+			setattr(args, key, value)
+
+	if not results:
+		releaseArrays(sharedMemory)
+		exit("Audio does not contain any samples between start and end time.")
+
+	if timings is not None:
+		for _, segmentTimings in results:
+			for part, seconds in segmentTimings.items():
+				timings[part] = timings.get(part, 0) + seconds
+
+	lastFrame = max(lastFrame for lastFrame, _ in results)
+	if frameData is not None:
+		frameData = frameData[:,:lastFrame]
+	return bins[:,:lastFrame], frameData, sharedMemory
 
+
+"""
+Trims the audio of every segment from <segments> to the samples its windows of <windowLength> reach into, so no more than that is sent to a process.
+"""
+def trimSegments(segments, windowLength):
+	for firstFrame, channelData, starts in segments:
+		segmentStart = max(starts[0], 0)
+		segmentEnd = min(starts[-1] + windowLength, channelData.shape[-1])
+		yield firstFrame, channelData[:,segmentStart:segmentEnd], starts - segmentStart
+
+
+"""
+Transforms, bins and smoothes the frames of one segment starting at <firstFrame> with the arguments <segmentArgs>
+and writes them into the shared <outputs>. The arguments are passed along, as a process that imported this module has none of its own.
+Returns the frame after the last frame of the segment and the seconds spent on the transform, binning and smoothing.
+"""
+def analyzeSegment(segmentArgs, firstFrame, channelData, starts, samplerate, outputs):
+	selectArgs(segmentArgs)
+	windowLength, frequencyRange = frameDataLayout(samplerate)
+
+	sharedMemory = []
+	arrays = {}
+	for key, descriptor in outputs.items():
+		shm, arrays[key] = attachArray(descriptor)
+		sharedMemory.append(shm)
+
+	timings = {"fft": 0, "bins": 0, "smoothing": 0}
+	fftStart = perf_counter()
+	for amplitudes in transformWindows(channelData, starts, windowLength, frequencyRange):
+		binStart = perf_counter()
+		timings["fft"] += binStart - fftStart
+		lastFrame = firstFrame + amplitudes.shape[1]
+		if "frameData" in arrays:
+			arrays["frameData"][:,firstFrame:lastFrame] = amplitudes
+		bins = createBins(amplitudes)
+		smoothStart = perf_counter()
+		timings["bins"] += smoothStart - binStart
+		if args.smoothY > 0:
+			bins = smoothBinData(bins)
+		arrays["bins"][:,firstFrame:lastFrame] = bins
+		firstFrame = lastFrame
+		fftStart = perf_counter()
+		timings["smoothing"] += fftStart - smoothStart
+
+	# Releases all references to shared memory before detaching from it
+	del arrays
+	for shm in sharedMemory:
+		shm.close()
+
+	return firstFrame, timings
+
+
+"""
+Scales the normalized <bins> logarithmically to the base args.ylog (in place).
+"""
+def scaleY(bins):
 	if args.ylog != 0:
 		div = np.log2(args.ylog + 1)						# Constant for y-scaling
-		bins = np.log2(args.ylog * np.array(bins) + 1)/div	# Y-scaling
+		bins *= args.ylog
+		bins += 1
+		np.log2(bins, out=bins)
+		bins /= div
 
-	numChunks = int(np.ceil(bins.shape[1]/(args.processes * args.chunkSize))) * args.processes		# Total number of chunks (expanded to be a multiple of args.processes)
 
-	shMem = Manager().dict()
-	shMem['framecount'] = 0
-	Parallel(n_jobs=args.processes)(delayed(renderSavePartial)(j, numChunks, bins, shMem) for j in range(args.processes))
+"""
+Splits <targets> into groups of targets that agree in the values of the arguments in <argNames>, in the order of their first target.
+"""
+def groupTargets(targets, argNames):
+	groups = {}
+	for target in targets:
+		groups.setdefault(tuple(getattr(target, name) for name in argNames), []).append(target)
+	return list(groups.values())
 
-	printProgressBar(bins.shape[1], bins.shape[1])
-	print()												# New line after progress bar
 
 """
-Renders and saves one process' share of frames in chunks
+Returns the bins of every target of <targets>. Bins are created once for all targets that agree in the arguments they depend on (BIN_ARGS),
+and the audio is analyzed once for all targets that agree in the arguments the frame data depends on (SPECTRUM_ARGS).
+Bins and frame data are taken from the cache where possible.
 """
-def renderSavePartial(partialCounter, numChunks, bins, shMem):
-	if args.imageSequence:
-		vid = None
+def createTargetBins(targets, samplerate, numChannels, contentHash, profile, maxSteps):
+	binGroups = groupTargets(targets, BIN_ARGS)
+	groupBins = {}
+	for representatives in groupTargets([group[0] for group in binGroups], SPECTRUM_ARGS):
+		for target, bins in zip(representatives, createSpectrumBins(representatives, samplerate, numChannels, contentHash, profile, maxSteps)):
+			groupBins[id(target)] = bins
+
+	targetBins = {}
+	for group in binGroups:
+		for target in group:
+			targetBins[id(target)] = groupBins[id(group[0])]
+	return [targetBins[id(target)] for target in targets]
+
+
+"""
+Returns the bins of each of <targets>, which all share the same frame data but need different bins.
+The frame data is only created (or loaded from the cache) if the bins of a target are not cached, and only once.
+It is only cached if args.cacheSpectra is set, as it is far larger than the bins.
+"""
+def createSpectrumBins(targets, samplerate, numChannels, contentHash, profile, maxSteps):
+	spectrumHash = contentHash if args.cacheSpectra else None
+	targetBins = []
+	for target in targets:
+		selectArgs(target)
+		with stage(profile, "cache"):
+			targetBins.append(loadCached(contentHash, "bins", BIN_ARGS))
+	missing = [i for i in range(len(targets)) if targetBins[i] is None]
+	if len(missing) < len(targets):
+		print("Loaded bins from cache. (3/{})".format(maxSteps))
+
+	frameData = None
+	analysisMemory = []
+	for i in missing:
+		selectArgs(targets[i])
+		if frameData is None:
+			with stage(profile, "cache"):
+				frameData = loadCached(spectrumHash, "spectra", SPECTRUM_ARGS)
+			if frameData is None:
+				print("Creating frame data and bins. (2/{})".format(maxSteps))
+				keepFrameData = spectrumHash is not None or i != missing[-1]		# For the cache or the bins of the remaining targets
+				timings = {}
+				with stage(profile, "analysis"):
+					audioBlocks, firstSample = decodeAudio(samplerate, numChannels)
+					bins, frameData, analysisMemory = analyzeAudio(timeIterator(profile, "decode", audioBlocks), samplerate, numChannels, firstSample, keepFrameData, timings)
+				recordParts(profile, "analysis", timings)
+				with stage(profile, "cache"):
+					storeCached(spectrumHash, "spectra", SPECTRUM_ARGS, frameData)
+					storeCached(contentHash, "bins", BIN_ARGS, bins)
+				targetBins[i] = np.array(bins)
+				del bins
+				continue
+			print("Loaded frame data from cache. (2/{})".format(maxSteps))
+
+		print("Creating bins. (3/{})".format(maxSteps))
+		with stage(profile, "bins"):
+			bins = createBins(frameData)
+		if args.smoothY > 0:
+			with stage(profile, "smoothing"):
+				bins = smoothBinData(bins)
+		with stage(profile, "cache"):
+			storeCached(contentHash, "bins", BIN_ARGS, bins)
+		targetBins[i] = bins
+
+	del frameData
+	releaseArrays(analysisMemory)
+	return targetBins
+
+
+"""
+Makes <namespace> the arguments that all functions work with, e.g. the arguments of one of several output targets.
+"""
+def selectArgs(namespace):
+	global args
+	args = namespace
+
+
+"""
+Splits <numFrames> frames into segments that are handed out to the processes one at a time.
+There are about SEGMENTS_PER_PROCESS segments per process, so processes that finish their segments early pick up remaining ones.
+Returns the (start, end) frame range of every segment.
+"""
+def planSegments(numFrames):
+	segmentFrames = max(args.chunkSize, min(MAX_SEGMENT_FRAMES, int(np.ceil(numFrames/(args.processes*SEGMENTS_PER_PROCESS)))))
+	return [(start, min(start + segmentFrames, numFrames)) for start in range(0, numFrames, segmentFrames)]
+
+
+"""
+Returns the path of the partial video of segment <segment>.
+"""
+def segmentPath(segment):
+	return args.destination + "/segment" + str(segment) + VID_EXT
+
+
+"""
+Creates the manifest of a render of <numFrames> frames of the audio with <contentHash>, or continues the render recorded in the manifest if args.resume is set.
+Returns the segments, the segments that still have to be rendered and whether the destination directory existed before the render was started.
+"""
+def prepareManifest(numFrames, directoryExisted, contentHash):
+	parametersHash = renderHash(args, contentHash, fileHash(args.image) if args.image else None, numFrames)
+	manifest = loadManifest(args.destination) if args.resume else None
+
+	if manifest is None:
+		if args.resume:
+			print("No render to resume in '{}', starting from the beginning.".format(args.destination))
+		manifest = {"parameters": parametersHash, "segments": planSegments(numFrames), "completed": [], "createdDirectory": not directoryExisted}
+		writeManifest(args.destination, manifest)
+	elif manifest["parameters"] != parametersHash:
+		exit("The render in '{}' was started with other parameters or audio and can not be resumed.".format(args.destination))
+
+	completed = set(manifest["completed"])
+	if not args.imageSequence:						# Partial videos are only ever moved into place once they are complete
+		completed = {segment for segment in completed if path.isfile(segmentPath(segment))}
+	pendingSegments = [segment for segment in range(len(manifest["segments"])) if segment not in completed]
+	if completed:
+		print("Resuming render, {} of {} segments are done.".format(len(completed), len(manifest["segments"])))
+
+	return manifest["segments"], pendingSegments, directoryExisted and not manifest["createdDirectory"]
+
+
+"""
+Renders frames from bin data for every output in <outputs> and exports them directly to one partial video per segment of the output
+If args.imageSequence is set for an output, instead exports its frames as images into its directory
+Starts at "0.png" for first frame.
+Every output carries its arguments, bins, segments and the segments still pending. All pending segments of all outputs are queued
+and every process takes the next one as soon as it is done with the last, so all outputs are rendered by the same processes.
+Finished segments are recorded in the manifest of their output (unless style testing).
+Returns the telemetry of every process, or an empty list if no segment is pending, e.g. when resuming a render that was only missing the concat.
+"""
+def renderSaveFrames(outputs):
+	if not any(output.pendingSegments for output in outputs):
+		return []
+
+	callerArgs = args
+	sharedMemory = []
+	sharedInputs = []
+	sharedBins = {}
+	for output in outputs:
+		binsKey = (id(output.bins), output.args.ylog)		# Outputs with the same bins and scaling share them
+		if binsKey not in sharedBins:
+			shm, outputBins, sharedBins[binsKey] = createArray(output.bins.shape, np.float32)
+			sharedMemory.append(shm)
+			np.divide(output.bins, np.max(output.bins), out=outputBins)		# Normalize vector length to [0,1]
+			selectArgs(output.args)
+			scaleY(outputBins)
+			del outputBins
+		sharedInputs.append({"bins": sharedBins[binsKey]})
+	selectArgs(callerArgs)
+
+	# Large read-only arguments are moved to shared memory, so they are not pickled along with args for every process
+	largeArgs = []
+	for namespace in [args] + [output.args for output in outputs if output.args is not args]:
+		largeArgs.append((namespace, {key: getattr(namespace, key) for key in SHARED_ARGS if hasattr(namespace, key)}))
+	for output, inputs in zip(outputs, sharedInputs):
+		for key in SHARED_ARGS:
+			if hasattr(output.args, key):
+				shm, inputs[key] = shareArray(getattr(output.args, key))
+				sharedMemory.append(shm)
+	for namespace, values in largeArgs:
+		for key in values:
+			setattr(namespace, key, None)
+
+	numFrames = sum(output.segments[segment][1] - output.segments[segment][0] for output in outputs for segment in output.pendingSegments)
+	progress, progressDescriptor = startProgress(args.processes, numFrames, args.progress)
+	try:
+		with Manager() as manager:
+			segmentQueue = manager.Queue()
+			for index, output in enumerate(outputs):			# Segments of one output follow each other, so processes rarely switch between outputs
+				for segment in output.pendingSegments:
+					segmentQueue.put((index, segment))
+			manifestLock = None if args.test else manager.Lock()
+			renderOutputs = [SimpleNamespace(args=output.args, segments=output.segments) for output in outputs]
+			telemetry = Parallel(n_jobs=args.processes)(delayed(renderSavePartial)(j, renderOutputs, segmentQueue, manifestLock, sharedInputs, progressDescriptor) for j in range(args.processes))
+	finally:
+		stopProgress(progress)
+		for namespace, values in largeArgs:
+			for key, value in values.items():
+				setattr(namespace, key, value)
+		releaseArrays(sharedMemory)
+
+	return telemetry
+
+"""
+Renders and saves segments of <outputs> taken from <segmentQueue> until it is empty
+Returns the telemetry of the process: its frames per second and the render and write time of every chunk.
+"""
+def renderSavePartial(partialCounter, outputs, segmentQueue, manifestLock, sharedInputs, progressDescriptor):
+	# Attaches to the bins and large arguments in shared memory
+	sharedMemory = []
+	bins = []
+	for output, inputs in zip(outputs, sharedInputs):
+		for key, descriptor in inputs.items():
+			shm, array = attachArray(descriptor)
+			sharedMemory.append(shm)
+			if key == "bins":
+				bins.append(array)
+			else:
+				setattr(output.args, key, array)
+	del array
+
+	progressShm, progressSlots = attachProgress(progressDescriptor)
+	sharedMemory.append(progressShm)
+	progressSlot = progressSlots[partialCounter:partialCounter+1]		# Only this process writes to its slot
+
+	workerArgs = args
+	workerProfile = startWorkerProfile(args, partialCounter)
+	current = None
+	plan = None
+	ring = None
+
+	while True:
+		try:
+			index, segment = segmentQueue.get_nowait()
+		except Empty:
+			break
+		if index != current:								# Only the frame ring of the current output is kept, which caps the memory
+			if ring is not None:
+				closeFrameRing(ring)
+			current = index
+			selectArgs(outputs[index].args)
+			plan = createRenderPlan(args)
+			ring = openFrameRing(args, WRITER_THREADS if args.imageSequence and not args.test else 1, saveFrames)	# Video frames have to be written in order
+		renderSaveSegment(segment, outputs[index].segments[segment], bins[index], plan, ring, progressSlot, workerProfile)
+		if manifestLock is not None:
+			markCompleted(args.destination, segment, manifestLock)
+
+	if ring is not None:
+		closeFrameRing(ring)
+	selectArgs(workerArgs)
+	telemetry = finishWorkerProfile(args, workerProfile, [output.args.destination for output in outputs])
+
+	# Releases all references to shared memory before detaching from it
+	del bins, progressSlots, progressSlot, plan, ring
+	for output, inputs in zip(outputs, sharedInputs):
+		for key in inputs:
+			if key != "bins":
+				setattr(output.args, key, None)
+	for shm in sharedMemory:
+		shm.close()
+
+	return telemetry
+
+"""
+Renders and exports the frames <start> to <end> of segment <segment> through the buffers of <ring>
+The frames are written in the background and waited for at the end of the segment.
+The partial video is encoded under a temporary name and only moved into place once it is complete.
+"""
+def renderSaveSegment(segment, frameRange, bins, plan, ring, progressSlot, workerProfile):
+	start, end = frameRange
+	if args.test:
+		output = None
+	elif args.imageSequence:
+		output = openImageWriter(args)
 	else:
-		fourcc = cv2.VideoWriter_fourcc(*VID_CODEC)
-		dest = args.destination+"/part"+str(partialCounter)+VID_EXT
-		vid = cv2.VideoWriter(dest, fourcc, args.framerate, (args.width, args.height))
-
-	chunksPerProcess = int(numChunks/args.processes)
-	for i in range(chunksPerProcess):
-		chunkCounter = partialCounter*chunksPerProcess + i
-		renderSaveChunk(chunkCounter, numChunks, bins, vid, shMem)
-
-	if not args.imageSequence:
-		vid.release()
-
-"""
-Renders and exports one chunk worth of frames
-"""
-def renderSaveChunk(chunkCounter, numChunks, bins, vid, shMem):
-	chunksPerProcess = int(numChunks/args.processes)
-	finishedChunkSets = int(chunkCounter/chunksPerProcess)
-	framesPerProcess = int(bins.shape[1]/args.processes)
-	currentChunkNumInNewSet = chunkCounter - finishedChunkSets * chunksPerProcess
-	start = finishedChunkSets * framesPerProcess + currentChunkNumInNewSet * args.chunkSize
-	end = start + args.chunkSize
-
-	if chunkCounter % chunksPerProcess == chunksPerProcess - 1:
-		completeChunkSets = int(numChunks/args.processes) - 1
-		fullSetChunks = completeChunkSets * args.processes
-		fullSetFrames = fullSetChunks * args.chunkSize
-		remainingFrames = bins.shape[1] - fullSetFrames
-		remainderChunkSize = int(remainingFrames/args.processes)
-		end = start + remainderChunkSize
-
-	frames = renderChunkFrames(bins, start, end)
+		output = openVideoEncoder(segmentPath(segment) + ".part")
+
+	for chunkStart in range(start, end, ring.slotFrames):
+		renderSaveChunk(segment, chunkStart, min(chunkStart + ring.slotFrames, end), bins, plan, ring, output, progressSlot, workerProfile)
+	flushRing(ring)
+
+	if args.test:
+		return
+	elif args.imageSequence:
+		closeImageWriter(output)
+	else:
+		closeVideoEncoder(output)
+		replace(segmentPath(segment) + ".part", segmentPath(segment))
+
+"""
+Renders one chunk of frames into the next free buffer of <ring> and hands it to the writer threads,
+which export it to <output>, the image writer or video encoder of the segment
+"""
+def renderSaveChunk(segment, start, end, bins, plan, ring, output, progressSlot, workerProfile):
+	waitStart = perf_counter()
+	slot, frames = takeSlot(ring)
+	renderStart = perf_counter()
+	renderChunkFrames(bins, plan, start, end, frames)
+	fillSlot(ring, slot, end - start, segment, start, output, workerProfile, renderStart - waitStart, perf_counter() - renderStart)
+
+	progressSlot[0] += end - start						# Progress is reported once per chunk
+
+"""
+Renders the frames <start> to <end> into <frames>, a buffer of the ring.
+"""
+def renderChunkFrames(bins, plan, start, end, frames):
+	return renderChunk(args, plan, bins, start, end, frames)
+
+"""
+Exports the chunk <frames> starting at frame <start> of segment <segment> to <output>. Runs on a writer thread of the ring.
+<waitTime> and <renderTime> are the seconds the chunk waited for a free buffer and took to render.
+"""
+def saveFrames(frames, segment, start, output, workerProfile, waitTime, renderTime):
+	writeStart = perf_counter()
 	if args.test:
 		plt.imsave("testFrame.png", frames[0], vmin=0, vmax=255, cmap='gray')
 	else:
 		for i in range(len(frames)):
 			if args.imageSequence:
-				plt.imsave(str(args.destination) + "/" + str(start + i) + ".png", frames[i], vmin=0, vmax=255, cmap='gray')
+				writeImage(output, frames[i], start + i)
 			else:
-				vid.write(frames[i])
-			shMem['framecount'] += 1
-			printProgressBar(shMem['framecount'], bins.shape[1])
+				writeVideoFrame(output, frames[i])
+	recordChunk(workerProfile, segment, start, start + len(frames), waitTime, renderTime, perf_counter() - writeStart)
+
+"""
+Starts an ffmpeg process that encodes the raw BGR frames written to its stdin into the partial video <dest>,
+using the codec, preset and crf given by the arguments.
+"""
+def openVideoEncoder(dest):
+	arguments = [
+		'ffmpeg',
+		'-hide_banner',
+		'-loglevel', 'error',
+		'-f', 'rawvideo',
+		'-pix_fmt', 'bgr24',
+		'-s', str(args.width) + "x" + str(args.height),
+		'-r', str(args.framerate),
+		'-i', '-',
+		'-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2:color=0x{:02x}{:02x}{:02x}'.format(*args.backgroundColor[::-1]),	# yuv420p requires even dimensions, the colors are BGR
+		'-c:v', args.videoCodec,
+		'-preset', args.encoderPreset,
+		'-crf', str(args.crf),
+		'-pix_fmt', 'yuv420p',
+		'-f', VID_EXT[1:],
+		'-y', dest
+	]
+
+	return subprocess.Popen(
+		arguments,
+		stdin=subprocess.PIPE,
+		stdout=stdout,
+		stderr=stderr,
+	)
 
 """
-Renders one chunk of frames
+Writes one frame to the ffmpeg process <vid>.
 """
-def renderChunkFrames(bins, start, end):
-	frames = []
-	for j in range(start, end):
-		frame = renderFrame(args, bins, j)
-		frames.append(frame)
-	return frames
+def writeVideoFrame(vid, frame):
+	try:
+		vid.stdin.write(np.ascontiguousarray(frame).data)
+	except BrokenPipeError:
+		exit("ffmpeg exited with a failure while encoding.")
 
 """
-Progress Bar (Modified from https://stackoverflow.com/questions/3173320/text-progress-bar-in-the-console)
+Finishes encoding of the partial video <vid>.
 """
-def printProgressBar (iteration, total, prefix = "Progress:", suffix = "Complete", decimals = 2, length = 50, fill = '█', printEnd = "\r"):
-	percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
-	filledLength = int(length * iteration // total)
-	bar = fill * filledLength + '-' * (length - filledLength)
-	print(f'\r{prefix} |{bar}| {percent}% ({iteration}/{total}) {suffix}', end = printEnd)
+def closeVideoEncoder(vid):
+	vid.stdin.close()
+	if vid.wait() != 0:
+		exit("ffmpeg exited with a failure while encoding.")
 
 
 """
-Concatenates partial videos to full video and overlays audio.
+Concatenates the partial videos of <segments> in order to full video and overlays audio.
+The partial videos are already encoded, so they are only copied.
 
 Returns ffmpeg's exit status (0 on success).
 """
-def createVideo():
-	with open(args.destination+"/vidList", "x") as vidList:
-		for i in range(args.processes):
-			vidList.write("file 'part"+ str(i) + VID_EXT +"'\n")
+def createVideo(segments):
+	with open(args.destination+"/vidList", "w") as vidList:
+		for segment in range(len(segments)):
+			vidList.write("file '" + path.basename(segmentPath(segment)) + "'\n")
 
 	arguments = [
 		'ffmpeg',
@@ -271,10 +854,8 @@ def createVideo():
 		arguments += ['-t', str(args.end - args.start)]
 
 	arguments += [
-		'-c:v', 'libx264',
-		'-preset', 'ultrafast',
-		'-crf', '16',
-		'-pix_fmt', 'yuv420p',
+		'-map', '0:v',
+		'-map', '1:a',
 		'-c', 'copy',
 		'-y', args.destination+VID_EXT
 	]
@@ -287,10 +868,11 @@ def createVideo():
 
 	return proc.wait()
 
-def cleanupFiles(directoryExisted):
+def cleanupFiles(directoryExisted, segments):
 	remove(args.destination+"/vidList")
-	for i in range(args.processes):
-		remove(args.destination+"/part"+str(i)+VID_EXT)
+	for segment in range(len(segments)):
+		remove(segmentPath(segment))
+	removeManifest(args.destination)
 
 	if not directoryExisted:
 		try:
@@ -300,58 +882,186 @@ def cleanupFiles(directoryExisted):
 			print("Directory '{}' can not be removed".format(args.destination))
 
 
+"""
+Processes the audio from <audioBlocks> as a stream and yields the bins of every frame as soon as its audio has arrived.
+Unlike the frames of a file, which are centered on their part of the audio, the window of a frame ends with the frame,
+so no audio after the frame is needed. Windows reaching before the start of the stream are zero-padded.
+Yields the bins of the completed frames with shape (channels, frames, bins).
+"""
+def streamBins(audioBlocks, samplerate):
+	windowLength, frequencyRange = frameDataLayout(samplerate)
+	stepSize = samplerate/args.framerate
+
+	carryData = None									# The audio that windows of upcoming frames still reach into
+	carryStart = 0										# Position of carryData in the stream
+	nextFrame = 0
+
+	for block in audioBlocks:
+		channels = selectChannels(block)
+		if carryData is None:
+			carryData = channels
+		else:
+			carryData = np.concatenate((carryData, channels), axis=-1)
+		available = carryStart + carryData.shape[-1]
+
+		frameEnds = np.trunc(stepSize * np.arange(nextFrame + 1, int(available/stepSize) + 2)).astype(np.int64)
+		frameEnds = frameEnds[frameEnds <= available]
+		if len(frameEnds) > 0:
+			windows = gatherWindows(carryData, frameEnds - windowLength - carryStart, windowLength)
+			frameData = np.abs(np.fft.rfft(windows, axis=-1)[...,frequencyRange])
+			bins = createBins(frameData)
+			if args.smoothY > 0:
+				bins = smoothBinData(bins)
+			yield bins
+			nextFrame += len(frameEnds)
+
+		# Drops the samples that precede the window of the next frame
+		nextStart = int(np.trunc(stepSize * (nextFrame + 1))) - windowLength
+		consumed = min(max(nextStart - carryStart, 0), carryData.shape[-1])
+		carryData = carryData[:,consumed:]
+		carryStart += consumed
+
+
+"""
+Normalizes the bins of a stream with a running peak, as the peak of the whole audio is not known in advance.
+The peak decays to half within PEAK_HALFLIFE seconds, so the visualization recovers after loud passages.
+Yields the normalized and y-scaled bins of <binBlocks>.
+"""
+def normalizeStream(binBlocks):
+	decay = 0.5**(1/(PEAK_HALFLIFE*args.framerate))		# Decay of the peak per frame
+	peak = 0
+	for bins in binBlocks:
+		framePeaks = np.max(bins, axis=(0,2))
+		peaks = np.empty(len(framePeaks))
+		for j, framePeak in enumerate(framePeaks):
+			peak = max(peak*decay, framePeak)
+			peaks[j] = peak
+
+		normalized = np.divide(bins, peaks[np.newaxis,:,np.newaxis], out=np.zeros_like(bins), where=peaks[np.newaxis,:,np.newaxis] > 0)
+		scaleY(normalized)
+		yield normalized
+
+
+"""
+Reads raw PCM from <args.filename> (- for stdin, or a FIFO) and writes every frame as raw BGR video to stdout
+as soon as its audio has arrived. Runs until the input ends.
+"""
+def renderStream():
+	if args.filename == "-":
+		source = stdin.buffer
+	else:
+		source = open(args.filename, "rb")
+
+	stepSize = args.samplerate/args.framerate
+	audioBlocks = readPcm(source, args.audioChannels, args.sampleFormat, max(int(stepSize), 1))	# One frame of audio at a time
+	plan = createRenderPlan(args)
+
+	try:
+		for bins in normalizeStream(streamBins(audioBlocks, args.samplerate)):
+			for start in range(0, bins.shape[1], args.chunkSize):
+				end = min(start + args.chunkSize, bins.shape[1])
+				stdout.buffer.write(renderChunk(args, plan, bins, start, end).data)
+			stdout.buffer.flush()
+	except BrokenPipeError:
+		stderr.write("Output closed, stopping stream.\n")
+		dup2(osOpen(devnull, O_WRONLY), stdout.fileno())	# Frames still buffered can not be flushed at exit
+	finally:
+		if source is not stdin.buffer:
+			source.close()
+
+
 """
 Main method. Initializes the complete process from start to finish.
 """
 if __name__ == '__main__':
 	args = initArgs()									# Arguments as global variables
 
+	if args.stream:										# Nothing but frames may be written to stdout
+		processArgs(args, args.audioChannels, float("inf"), args.samplerate)
+		renderStream()
+		exit()
+
+	if args.progress == "json":							# Only the JSON lines of the progress are written to stdout, so they can be parsed
+		sys.stdout = stderr
+
 	startTime = time()
+	profile = startProfile(args)
+	mainArgs = args
+	targets = args.targets or [args]					# Every target is rendered with its own arguments from the same analysis
 
 	maxSteps = 5
 	if args.imageSequence:
 		maxSteps = 4
 
-	# Create destination folder
-	directoryExisted = False
-	if not path.exists(args.destination) and not args.test:
-		mkdir(args.destination)
-	else:
-		directoryExisted = True
+	# Create destination folders
+	directoriesExisted = []
+	for target in targets:
+		if not path.exists(target.destination) and not args.test:
+			mkdir(target.destination)
+			directoriesExisted.append(False)
+		else:
+			directoriesExisted.append(True)
 
 
 	print("Loading audio. (1/{})".format(maxSteps))
-	fileData, samplerate = loadAudio()
-	processArgs(args, fileData, samplerate)
+	with stage(profile, "probe"):
+		samplerate, numChannels, audioLength = loadAudio()
+		processArgs(args, numChannels, audioLength, samplerate)
+		for target in args.targets or []:
+			processArgs(target, numChannels, audioLength, samplerate)
 
-	print("Creating frame data. (2/{})".format(maxSteps))
-	frameData = calculateFrameData(fileData, samplerate)
-	del fileData, samplerate
-
-	print("Creating bins. (3/{})".format(maxSteps))
-	bins = createBins(frameData)
-	if args.smoothY > 0:
-		bins = smoothBinData(bins)
-	del frameData
+	with stage(profile, "cache"):						# Hashed once for the cache and the manifests of all targets
+		contentHash = audioHash() if args.cacheSize != 0 or not args.test else None
+	targetBins = createTargetBins(targets, samplerate, numChannels, contentHash if args.cacheSize != 0 else None, profile, maxSteps)
 
 	if args.imageSequence:
 		print("Creating and saving image sequence. (4/{})".format(maxSteps))
 	else:
 		print("Creating and saving partial videos. (4/{})".format(maxSteps))
-	renderSaveFrames(bins)
-	del bins
-
-	if not args.imageSequence:
-		print("Concatenating to full video and overlaying audio. (5/{})".format(maxSteps))
-		if createVideo() != 0:
-			exit("ffmpeg exited with a failure.")
+	outputs = []
+	for target, bins, directoryExisted in zip(targets, targetBins, directoriesExisted):
+		selectArgs(target)
+		numFrames = bins.shape[1]
+		if args.test:
+			segments = planSegments(numFrames)
+			pendingSegments = list(range(len(segments)))
+		else:
+			segments, pendingSegments, directoryExisted = prepareManifest(numFrames, directoryExisted, contentHash)
+			if args.imageSequence:
+				createFrameFile(args, numFrames)
+		outputs.append(SimpleNamespace(args=target, bins=bins, segments=segments, pendingSegments=pendingSegments, directoryExisted=directoryExisted))
+	selectArgs(mainArgs)
+	del targetBins, bins
+	with stage(profile, "render"):
+		telemetry = renderSaveFrames(outputs)
+	numFrames = sum(output.bins.shape[1] for output in outputs)
+	for output in outputs:
+		del output.bins
+
+	for output in outputs:
+		selectArgs(output.args)
+		if not args.imageSequence:
+			print("Concatenating to full video and overlaying audio. (5/{})".format(maxSteps))
+			with stage(profile, "concat"):
+				if createVideo(output.segments) != 0:
+					exit("ffmpeg exited with a failure.")
 
 
 	processTime = time() - startTime
 	print("Completed successfully in " + str(format(processTime, ".3f")) + " seconds.")
 
-	if not args.imageSequence:
-		print("Cleaning up files.")
-		cleanupFiles(directoryExisted)
+	for output in outputs:
+		selectArgs(output.args)
+		if not args.imageSequence:
+			print("Cleaning up files.")
+			with stage(profile, "cleanup"):
+				cleanupFiles(output.directoryExisted, output.segments)
+		elif not args.test:
+			removeManifest(args.destination)
+	selectArgs(mainArgs)
+
+	if profile is not None:
+		for output in outputs:					# Every target gets the report next to it, the primary destination is not written with targets
+			print("Saved profile to " + writeReport(output.args, profile, telemetry, numFrames))
 
 	print("Finished!")
@@ -1,9 +1,28 @@
 import color
 import arguments
+import AudioSpectrumVisualizer
+import cache
+import manifest
+import pipeline
+import progress
+import profiling
+import styles
+import skimage.draw
+import threading
+from shared import releaseArrays
+import audio
+import images
 
 import pytest
+import argparse
+import os
+import shutil
+import subprocess
+import io
+import json
 import sys
 import numpy as np
+from PIL import Image
 from math import isclose
 
 def test_colorDict2rgb():
@@ -33,7 +52,7 @@ def getArgs(argsList):
     args = arguments.initArgs()
     fileData = np.load("testData.npy")
     samplerate = 44100
-    arguments.processArgs(args, fileData, samplerate)
+    arguments.processArgs(args, 1, len(fileData)/samplerate, samplerate)
     return args
 
 # args tests
@@ -120,6 +139,22 @@ def test_exitOnInvalidArgs():
         args = getArgs(['-cs', '0'])
     with pytest.raises(SystemExit):
         args = getArgs(['-p', '0'])
+    with pytest.raises(SystemExit):
+        args = getArgs(['-csz', '-1'])
+
+    # Streaming
+    with pytest.raises(SystemExit):
+        args = getArgs(['-sm', '-sf', 'u8'])
+    with pytest.raises(SystemExit):
+        args = getArgs(['-sm', '-is'])
+
+    # Image sequences
+    with pytest.raises(SystemExit):
+        args = getArgs(['-is', '-if', 'jpg'])
+    with pytest.raises(SystemExit):
+        args = getArgs(['-is', '-pc', '-1'])
+    with pytest.raises(SystemExit):
+        args = getArgs(['-is', '-pc', '10'])
 
 
 def test_processArgs():
@@ -135,3 +170,499 @@ def test_processArgs():
     args = getArgs(['-c', 'hotpink', '-bgc', 'hotpink'])
     assert args.color == [180, 105, 255]
     assert args.backgroundColor == [180, 105, 255]
+
+# analysis tests
+def test_calculateFrameData():
+    args = getArgs(['-fr', '60', '-d', '20'])
+    AudioSpectrumVisualizer.args = args
+    fileData = np.load("testData.npy").astype(np.float64)
+
+    frameData = AudioSpectrumVisualizer.calculateFrameData([fileData], 44100)
+    assert frameData.shape == (1, 2, 442)
+
+    # Decoding in small blocks carries the overlapping samples over to the next block
+    blocks = [fileData[i:i+100] for i in range(0, len(fileData), 100)]
+    assert np.allclose(AudioSpectrumVisualizer.calculateFrameData(blocks, 44100), frameData)
+
+    # Leftbound frame: the window is zero-padded in front of the data
+    window = np.zeros(882)
+    window[73:] = fileData[:809]
+    assert np.allclose(frameData[0,0], np.abs(np.fft.rfft(window)))
+
+    # Rightbound frame: the window is zero-padded behind the data
+    window = np.zeros(882)
+    window[:809] = fileData[661:]
+    assert np.allclose(frameData[0,1], np.abs(np.fft.rfft(window)))
+
+def test_createBins():
+    args = getArgs(['-b', '8', '-xlog', '2'])
+    AudioSpectrumVisualizer.args = args
+    frameData = np.random.default_rng(0).random((2, 3, 20))
+
+    dataStarts, dataEnds = AudioSpectrumVisualizer.binEdges(20)
+    assert list(dataStarts) == [0, 0, 1, 2, 5, 7, 11, 15]
+    assert list(dataEnds) == [1, 1, 2, 5, 7, 11, 15, 20]
+
+    bins = AudioSpectrumVisualizer.createBins(frameData)
+    assert bins.shape == (2, 3, 8)
+    for k in range(8):
+        assert np.allclose(bins[:,:,k], np.mean(frameData[:,:,dataStarts[k]:dataEnds[k]], axis=-1))
+
+def test_smoothBinData():
+    args = getArgs(['-sy', '2'])
+    AudioSpectrumVisualizer.args = args
+    bins = np.arange(6, dtype=np.float64).reshape(1, 1, 6) ** 2
+
+    binsSmoothed = AudioSpectrumVisualizer.smoothBinData(bins)
+    assert np.allclose(binsSmoothed[0,0], [
+        np.mean([0, 1, 4]),             # Window shrinks at the first bins
+        np.mean([0, 1, 4, 9]),
+        np.mean([0, 1, 4, 9, 16]),
+        np.mean([1, 4, 9, 16, 25]),
+        np.mean([4, 9, 16, 25]),        # Window shrinks at the last bins
+        np.mean([9, 16, 25]),
+    ])
+
+def test_analyzeAudio():
+    args = getArgs(['-fr', '60', '-d', '20', '-b', '8', '-sy', '1'])
+    args.end = 1
+    args.processes = 1
+    AudioSpectrumVisualizer.args = args
+    fileData = np.random.default_rng(0).standard_normal(44100).astype(np.float32)
+    blocks = [fileData[i:i+1000] for i in range(0, len(fileData), 1000)]
+
+    frameData = AudioSpectrumVisualizer.calculateFrameData(blocks, 44100)
+    bins = AudioSpectrumVisualizer.smoothBinData(AudioSpectrumVisualizer.createBins(frameData))
+
+    # Analyzing in segments yields exactly the same frame data and bins
+    segmentBins, segmentFrameData, sharedMemory = AudioSpectrumVisualizer.analyzeAudio(iter(blocks), 44100, 1, 0, True)
+    assert np.array_equal(segmentFrameData, frameData)
+    assert np.array_equal(segmentBins, bins)
+    del segmentBins, segmentFrameData
+    releaseArrays(sharedMemory)
+
+    # Segments analyzed by several processes are reassembled to the same result, and the time of each step is added up
+    args.processes = 2
+    timings = {}
+    parallelBins, parallelFrameData, sharedMemory = AudioSpectrumVisualizer.analyzeAudio(iter(blocks), 44100, 1, 0, True, timings)
+    assert np.array_equal(parallelFrameData, frameData)
+    assert np.array_equal(parallelBins, bins)
+    assert sorted(timings) == ["bins", "fft", "smoothing"] and all(seconds >= 0 for seconds in timings.values())
+    del parallelBins, parallelFrameData
+    releaseArrays(sharedMemory)
+
+def test_profileStages():
+    profile = profiling.startProfile(argparse.Namespace(profile=True))
+    with profiling.stage(profile, "cache"):
+        pass
+    with profiling.stage(profile, "analysis"):
+        pass
+    with profiling.stage(profile, "cache"):
+        pass
+    profiling.recordParts(profile, "analysis", {"fft": 1, "bins": 2})
+    profiling.recordParts(profile, "analysis", {"fft": 3})
+
+    # Repeated stages are combined into one entry in the order they first ran
+    assert [entry["stage"] for entry in profile.stages] == ["cache", "analysis"]
+    assert profile.stages[1]["parts"] == {"fft": 4, "bins": 2}
+    profile.stopEvent.set()
+
+def test_targets():
+    args = getArgs(['-b', '32', '-tg', 'line', '1080x1920', 'vertical', '-tg', 'default', '1920x540', 'banner', '-tg', 'pretty', '480x270', 'pretty'])
+    vertical, banner, pretty = args.targets
+    assert (vertical.style, vertical.width, vertical.height, vertical.destination) == ("line", 1080, 1920, "vertical")
+    assert (banner.style, banner.width, banner.height, banner.destination) == ("bars", 1920, 540, "banner")
+    assert vertical.bins == 32                  # Flags given by the user override the flags of the preset
+    assert pretty.height == 270                 # The size of the target overrides the flags of the preset
+
+    fileData = np.load("testData.npy")
+    for target in args.targets:
+        target.test = True                      # Analyzes testData.npy
+        arguments.processArgs(target, 1, len(fileData)/44100, 44100)
+    assert AudioSpectrumVisualizer.groupTargets(args.targets, cache.BIN_ARGS) == [[vertical, banner], [pretty]]
+
+    # Targets with the same analysis share their bins, which are the same as analyzing for every target on its own
+    targetBins = AudioSpectrumVisualizer.createTargetBins(args.targets, 44100, 1, None, None, 5)
+    assert targetBins[0] is targetBins[1]
+    for target, bins in zip(args.targets, targetBins):
+        AudioSpectrumVisualizer.args = target
+        ownBins, _, sharedMemory = AudioSpectrumVisualizer.analyzeAudio([fileData], 44100, 1)
+        assert np.array_equal(bins, ownBins)
+        del ownBins
+        releaseArrays(sharedMemory)
+
+    with pytest.raises(SystemExit):
+        getArgs(['-tg', 'default', '1920', 'banner'])
+    with pytest.raises(SystemExit):
+        getArgs(['-tg', 'default', '1920x540', 'banner', '-tg', 'line', '1080x1920', 'banner'])
+
+# render tests
+def test_planSegments():
+    args = getArgs(['-p', '3', '-cs', '7'])
+    AudioSpectrumVisualizer.args = args
+
+    for numFrames in [1, 7, 100, 1001, 100000]:
+        segments = AudioSpectrumVisualizer.planSegments(numFrames)
+        # Segments cover every frame exactly once and in order
+        assert segments[0][0] == 0 and segments[-1][1] == numFrames
+        assert all(end == nextStart for (_, end), (nextStart, _) in zip(segments, segments[1:]))
+        assert all(end - start <= max(args.chunkSize, AudioSpectrumVisualizer.MAX_SEGMENT_FRAMES) for start, end in segments)
+
+    # There are enough segments to balance the work
+    assert len(AudioSpectrumVisualizer.planSegments(1001)) >= 3*AudioSpectrumVisualizer.SEGMENTS_PER_PROCESS
+
+def test_manifest(tmp_path):
+    args = getArgs([])
+    parametersHash = manifest.renderHash(args, "hash", None, 100)
+
+    # Only the arguments the frames depend on change the hash
+    assert manifest.renderHash(getArgs(['-p', '3', '-cs', '5', '-pg', 'none']), "hash", None, 100) == parametersHash
+    assert manifest.renderHash(getArgs(['-st', 'line']), "hash", None, 100) != parametersHash
+    assert manifest.renderHash(args, "otherHash", None, 100) != parametersHash
+    assert manifest.renderHash(args, "hash", "imageHash", 100) != parametersHash
+
+    directory = str(tmp_path)
+    assert manifest.loadManifest(directory) is None
+    manifest.writeManifest(directory, {"parameters": parametersHash, "segments": [[0, 50], [50, 100]], "completed": []})
+    manifest.markCompleted(directory, 1, threading.Lock())
+    assert manifest.loadManifest(directory)["completed"] == [1]
+    assert os.listdir(directory) == [manifest.MANIFEST_NAME]
+
+def test_resumeCompleted(tmp_path, capsys):
+    args = getArgs(['-is', '-p', '2', '-cs', '10'])
+    args.destination = str(tmp_path)
+    AudioSpectrumVisualizer.args = args
+    segments, pendingSegments, _ = AudioSpectrumVisualizer.prepareManifest(100, True, "hash")
+    for segment in range(len(segments)):
+        manifest.markCompleted(args.destination, segment, threading.Lock())
+
+    # A resumed render whose segments are all done renders nothing and goes on to the end
+    args.resume = True
+    segments, pendingSegments, _ = AudioSpectrumVisualizer.prepareManifest(100, True, "hash")
+    assert pendingSegments == []
+    output = argparse.Namespace(args=args, bins=np.ones((1, 100, args.bins), dtype=np.float32), segments=segments, pendingSegments=pendingSegments)
+    assert AudioSpectrumVisualizer.renderSaveFrames([output]) == []
+
+    progress.printProgressBar(0, 0)
+    assert "100.00% (0/0)" in capsys.readouterr().out
+
+def test_frameRing():
+    args = getArgs(['-ht', '4', '-w', '6', '-cs', '10'])
+    written = []
+    ring = pipeline.openFrameRing(args, 1, lambda frames, start: written.extend((start + i, int(frames[i,0,0,0])) for i in range(len(frames))))
+    assert ring.slotFrames == 3 and len(ring.buffers) == pipeline.RING_SLOTS
+
+    # Buffers are reused once written, and a single writer thread keeps the order
+    for start in range(0, 20, ring.slotFrames):
+        slot, frames = pipeline.takeSlot(ring)
+        numFrames = min(ring.slotFrames, 20 - start)
+        frames[:numFrames] = np.arange(start, start + numFrames, dtype=np.uint8)[:,None,None,None]
+        pipeline.fillSlot(ring, slot, numFrames, start)
+    pipeline.flushRing(ring)
+    assert written == [(i, i) for i in range(20)]
+    pipeline.closeFrameRing(ring)
+
+    # Errors of the writer threads are raised in the rendering thread
+    def failWrite(frames):
+        sys.exit("write failed")
+    ring = pipeline.openFrameRing(args, 2, failWrite)
+    slot, frames = pipeline.takeSlot(ring)
+    pipeline.fillSlot(ring, slot, 1)
+    with pytest.raises(SystemExit):
+        pipeline.flushRing(ring)
+    with pytest.raises(SystemExit):
+        pipeline.closeFrameRing(ring)
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="requires ffmpeg")
+def test_decodeAudio(tmp_path):
+    # Compressed audio, whose decoder needs some audio before the seek point to decode it correctly
+    filename = str(tmp_path / "audio.mp3")
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "anoisesrc=d=4:r=44100:a=0.5:s=1", "-c:a", "libmp3lame", filename], check=True)
+    fullData = np.concatenate(list(audio.streamAudio(getArgs([]), filename, 44100, 1)))
+
+    for start, framerate in [(1, 60), (2.5, 24), (0.98333, 60)]:
+        sys.argv = ['AudioSpectrumVisualizer.py', filename, 'destination', '-s', str(start), '-e', '3', '-fr', str(framerate)]
+        args = arguments.initArgs()
+        arguments.processArgs(args, 1, 4, 44100)
+        AudioSpectrumVisualizer.args = args
+        audioBlocks, firstSample = AudioSpectrumVisualizer.decodeAudio(44100, 1)
+        clipData = np.concatenate(list(audioBlocks))
+
+        # Decoding a clip yields exactly the samples of a full decode from the start point on
+        dataStart = int(args.start*44100)
+        dataEnd = int(args.end*44100)
+        assert np.array_equal(clipData[dataStart - firstSample:dataEnd - firstSample], fullData[dataStart:dataEnd])
+
+def test_probeAudio(monkeypatch):
+    def fakeProbe(duration):
+        output = '{"streams": [{"sample_rate": "44100", "channels": 2}], "format": {' + ('"duration": "' + duration + '"' if duration else '') + '}}'
+        monkeypatch.setattr(audio.subprocess, "run", lambda *args, **kwargs: audio.subprocess.CompletedProcess(args, 0, output, ""))
+
+    fakeProbe("12.5")
+    assert audio.probeAudio("file.mp3") == (44100, 2, 12.5)
+
+    # A missing or unknown duration exits with a message instead of a traceback
+    for duration in [None, "N/A"]:
+        fakeProbe(duration)
+        with pytest.raises(SystemExit):
+            audio.probeAudio("file.mp3")
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_jsonProgress(tmp_path):
+    filename = str(tmp_path / "audio.wav")
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=f=440:d=1:r=44100", filename], check=True)
+    result = subprocess.run([sys.executable, "AudioSpectrumVisualizer.py", filename, str(tmp_path / "frames"), "-is", "-w", "64", "-ht", "48", "-fr", "30", "-p", "1", "-csz", "0", "-pg", "json"],
+        capture_output=True, text=True, check=True)
+
+    # Stdout only holds the progress, one JSON object per line, up to all frames done. The other messages go to stderr
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert lines and all(sorted(line) == ["eta", "fps", "framesDone", "totalFrames"] for line in lines)
+    assert lines[-1]["framesDone"] == lines[-1]["totalFrames"] == 30
+    assert "Finished!" in result.stderr
+
+# image tests
+def test_saveImage(tmp_path):
+    frame = np.zeros((3, 4, 3), dtype=np.uint8)
+    frame[0,0] = [255, 0, 0]
+    frame[2,3] = [0, 0, 255]
+    frame[1] = np.arange(12, dtype=np.uint8).reshape(4, 3)
+
+    # Image sequences are rendered in RGB, unlike videos, which are piped to ffmpeg as BGR
+    assert getArgs(['-is', '-c', 'ff0000']).color == [255, 0, 0]
+    assert getArgs(['-c', 'ff0000']).color == [0, 0, 255]
+
+    for imageFormat in ["png", "bmp", "ppm"]:
+        args = getArgs(['-is', '-if', imageFormat, '-pc', '9'])
+        args.destination = str(tmp_path)
+        images.saveImage(args, frame, images.imagePath(args, 7))
+        filename = os.path.join(str(tmp_path), "7." + imageFormat)
+
+        # The image reads back as the same RGB pixels
+        with Image.open(filename) as image:
+            assert image.mode == "RGB" and np.array_equal(np.asarray(image), frame), imageFormat
+
+    with open(os.path.join(str(tmp_path), "7.ppm"), "rb") as file:
+        assert file.read() == b"P6\n4 3\n255\n" + frame.tobytes()
+
+def test_frameFile(tmp_path):
+    args = getArgs(['-is', '-if', 'npy', '-ht', '3', '-w', '4'])
+    args.destination = str(tmp_path)
+    filename = os.path.join(str(tmp_path), images.FRAMES_NAME)
+    images.createFrameFile(args, 5)
+
+    # Frames are written into one array file of all frames, in any order
+    writer = images.openImageWriter(args)
+    for index in [4, 0, 2]:
+        images.writeImage(writer, np.full((3, 4, 3), index + 1, dtype=np.uint8), index)
+    images.closeImageWriter(writer)
+    frames = np.load(filename)
+    assert frames.shape == (5, 3, 4, 3) and frames.dtype == np.uint8
+    assert [int(frame[0,0,0]) for frame in frames] == [1, 0, 3, 0, 5]
+
+    # A resumed render keeps the frames of a file of the same shape and replaces a file of another shape
+    images.createFrameFile(args, 5)
+    assert np.array_equal(np.load(filename), frames)
+    images.createFrameFile(args, 6)
+    assert np.load(filename).shape == (6, 3, 4, 3) and not np.any(np.load(filename))
+
+    # Other formats need no array file
+    os.remove(filename)
+    args = getArgs(['-is', '-if', 'png'])
+    args.destination = str(tmp_path)
+    images.createFrameFile(args, 5)
+    assert not os.path.exists(filename)
+
+# streaming tests
+def test_readPcm():
+    samples = np.array([[0, 16384], [-32768, 32767], [8192, -8192]], dtype="<i2")
+    source = io.BytesIO(samples.tobytes() + b"\x00")          # Incomplete trailing sample is dropped
+
+    blocks = list(audio.readPcm(source, 2, "s16le", 2))
+    assert [block.shape for block in blocks] == [(2, 2), (1, 2)]
+    assert np.array_equal(np.concatenate(blocks), samples/32768)
+
+def test_streamBins():
+    args = getArgs(['-fr', '60', '-d', '20', '-b', '8'])
+    AudioSpectrumVisualizer.args = args
+    fileData = np.load("testData.npy").astype(np.float64)
+
+    bins = np.concatenate(list(AudioSpectrumVisualizer.streamBins([fileData[i:i+100] for i in range(0, len(fileData), 100)], 44100)), axis=1)
+    assert bins.shape == (1, 2, 8)
+    assert np.allclose(np.concatenate(list(AudioSpectrumVisualizer.streamBins([fileData], 44100)), axis=1), bins)
+
+    # The window of a frame ends with the frame, windows before the start of the stream are zero-padded
+    window = np.zeros(882)
+    window[147:] = fileData[:735]
+    assert np.allclose(bins[0,0], AudioSpectrumVisualizer.createBins(np.abs(np.fft.rfft(window))[np.newaxis,np.newaxis])[0,0])
+    window = fileData[1470-882:1470]
+    assert np.allclose(bins[0,1], AudioSpectrumVisualizer.createBins(np.abs(np.fft.rfft(window))[np.newaxis,np.newaxis])[0,0])
+
+def test_normalizeStream():
+    args = getArgs(['-fr', '10', '-b', '2'])
+    AudioSpectrumVisualizer.args = args
+    decay = 0.5**(1/(AudioSpectrumVisualizer.PEAK_HALFLIFE*10))
+    frames = np.array([[2, 1], [1, 0.5], [4, 2], [0, 0], [1, 1]], dtype=np.float32)[np.newaxis]
+    blocks = list(AudioSpectrumVisualizer.normalizeStream([frames[:,:3], frames[:,3:]]))
+
+    # Every frame is divided by the running peak, which decays per frame and jumps to louder frames, also across blocks
+    peaks = np.array([2, 2*decay, 4, 4*decay, 4*decay**2])
+    assert np.allclose(np.concatenate(blocks, axis=1), frames/peaks[np.newaxis,:,np.newaxis])
+
+    # Silence stays silent instead of being divided by a peak of 0
+    silence = list(AudioSpectrumVisualizer.normalizeStream([np.zeros((2, 3, 2), dtype=np.float32)]*2))
+    assert all(np.array_equal(block, np.zeros((2, 3, 2))) for block in silence)
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_renderStream():
+    # One second of PCM piped in yields one raw frame per 1/framerate seconds, and nothing else on stdout
+    pcm = subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=f=440:d=1:r=44100", "-ac", "2", "-f", "s16le", "-"], capture_output=True, check=True).stdout
+    frames = subprocess.run([sys.executable, "AudioSpectrumVisualizer.py", "-", "-sm", "-w", "64", "-ht", "48", "-fr", "30", "-p", "1"], input=pcm, capture_output=True, check=True).stdout
+    assert len(frames) == 30*64*48*3
+
+# cache tests
+def test_cache(tmp_path):
+    args = getArgs([])
+    key = cache.entryKey(args, "hash", "bins", cache.BIN_ARGS)
+
+    # Only the arguments the result depends on change the key
+    assert cache.entryKey(getArgs(['-st', 'line', '-c', 'red', '-m', '1']), "hash", "bins", cache.BIN_ARGS) == key
+    assert cache.entryKey(getArgs(['-b', '32']), "hash", "bins", cache.BIN_ARGS) != key
+    assert cache.entryKey(getArgs(['-b', '32']), "hash", "spectra", cache.SPECTRUM_ARGS) == cache.entryKey(args, "hash", "spectra", cache.SPECTRUM_ARGS)
+    assert cache.entryKey(args, "otherHash", "bins", cache.BIN_ARGS) != key
+
+    directory = str(tmp_path)
+    assert cache.loadEntry(directory, key) is None
+
+    bins = np.random.default_rng(0).random((1, 10, 64))
+    cache.storeEntry(directory, key, bins, 10**6)
+    assert np.array_equal(cache.loadEntry(directory, key), bins)
+
+    # The least recently used entry is evicted once the cache is full
+    cache.storeEntry(directory, "other", bins, 10**6)
+    for name in (key, "other"):
+        os.utime(tmp_path / (name + ".npy"), (0, 0))        # Both entries were last used long ago,
+    cache.loadEntry(directory, key)                         # but one of them is used again
+    cache.storeEntry(directory, "third", bins, 2*bins.nbytes + 1000)
+    assert cache.loadEntry(directory, key) is not None
+    assert cache.loadEntry(directory, "other") is None
+    assert cache.loadEntry(directory, "third") is not None
+
+def test_cacheSpectra(tmp_path):
+    # Only the bins are cached, unless the frame data is asked for as well
+    for argsList, stages in [([], ["bins"]), (['-csp'], ["bins", "spectra"])]:
+        args = getArgs(['-t', '-b', '8', '-cd', str(tmp_path / str(len(argsList)))] + argsList)
+        AudioSpectrumVisualizer.args = args
+        bins = AudioSpectrumVisualizer.createTargetBins([args], 44100, 1, "hash", None, 5)[0]
+        assert sorted(name.split("-")[0] for name in os.listdir(args.cacheDirectory)) == stages
+
+        # A second render loads the bins from the cache
+        assert np.array_equal(AudioSpectrumVisualizer.createTargetBins([args], 44100, 1, "hash", None, 5)[0], bins)
+
+# style tests
+STYLE_CASES = {
+    "bars": [], "barsStereo": ['-ch', 'stereo'], "barsMirror1": ['-m', '1'], "barsMirror2": ['-m', '2'],
+    "barsBarHeight": ['-bht', '5', '-bw', '6', '-bs', '2'], "barsOneBin": ['-b', '1'],
+    "circles": ['-st', 'circles', '-bw', '6', '-bs', '2'], "donuts": ['-st', 'donuts', '-bw', '7', '-bs', '1'],
+    "line": ['-st', 'line', '-lt', '1'], "lineThick": ['-st', 'line', '-lt', '3'], "lineStereo": ['-st', 'line', '-ch', 'stereo'], "lineOneBin": ['-st', 'line', '-b', '1'],
+    "fill": ['-st', 'fill'], "fillStereo": ['-st', 'fill', '-ch', 'stereo'], "fillOneBin": ['-st', 'fill', '-b', '1'], "fillManyBins": ['-st', 'fill', '-b', '80'],
+    "radialBars": ['-r'], "radialLine": ['-r', '-st', 'line'], "radialLineOneBin": ['-r', '-st', 'line', '-b', '1'],
+    "radialFill": ['-r', '-st', 'fill', '-cc', '180', '-rt', '-90'], "radialStereo": ['-r', '-ch', 'stereo'],
+}
+
+# Renders four 64x48 frames of the style case <name> with 8 bins (unless given): all bins 0, all bins 1 and two frames of random bins.
+# testFrames.npz holds the frames of every case rendered by this function.
+def renderStyleCase(name):
+    sys.argv = ['AudioSpectrumVisualizer.py', 'inputfile', 'destination', '-w', '64', '-ht', '48', '-b', '8', '-is'] + STYLE_CASES[name]
+    args = arguments.initArgs()
+    arguments.processArgs(args, 2, 10, 44100)
+
+    bins = np.random.default_rng(1).random((2 if args.channel == "stereo" else 1, 4, args.bins)).astype(np.float32)
+    bins[:,0] = 0
+    bins[:,1] = 1
+    plan = styles.createRenderPlan(args)
+    return args, np.array(styles.renderChunk(args, plan, bins, 0, bins.shape[1]))
+
+def test_styleReferences():
+    # Bars, circles, donuts and line match the original per-frame renderer. Fill differs from it for all bins 0 (nothing is drawn)
+    # and for more bins than columns, radial bars and fill differ at the edges of the bins (see test_radialStyles)
+    references = np.load("testFrames.npz")
+    assert sorted(references.files) == sorted(STYLE_CASES)
+    for name in STYLE_CASES:
+        _, frames = renderStyleCase(name)
+        assert np.array_equal(frames, references[name]), name
+
+# Draws frame <j> of the mono <bins> with the polygons and lines of the original radial renderer, as a reference for the polar map.
+# The original rounds the corners of the polygons down to whole pixels, unless <exact> is set
+def drawRadialPolygons(args, bins, j, exact=False):
+    frame = np.full((args.height, args.width, 3), args.backgroundColor, dtype=np.uint8)
+    midHeight, midWidth = int(args.height/2), int(args.width/2)
+    radii = args.radiusStart + bins[0,j]*(args.radiusEnd - args.radiusStart)
+    def vector(radius, angle):
+        turn = 2*np.pi*(angle*args.circumference + args.rotation)
+        return midHeight + radius*np.cos(turn), midWidth + radius*np.sin(turn)
+
+    for k in range(args.bins):
+        nextK = min(k + 1, args.bins - 1)
+        if args.style == "line":
+            y1, x1 = vector(radii[k], k/args.bins)
+            y2, x2 = vector(radii[nextK], (k + 1)/args.bins)
+            rr, cc = skimage.draw.line(int(y1 - 1), int(x1 - 1), int(y2 - 1), int(x2 - 1))
+            for r, c in zip(rr, cc):
+                frame[r:int(r + args.lineThickness), int(c + 0.5*args.lineThickness):int(c + 1.5*args.lineThickness)] = args.color
+            continue
+
+        gap = args.binSpacing/2/args.width if args.style == "bars" else 0
+        angleStart, angleEnd = k/args.bins + gap, (k + 1)/args.bins - gap
+        endRadius = radii[k] if args.style == "bars" else radii[nextK]
+        corners = [vector(args.radiusStart, angleStart), vector(radii[k], angleStart), vector(endRadius, angleEnd), vector(args.radiusStart, angleEnd)]
+        pixel = float if exact else int
+        rr, cc = skimage.draw.polygon([pixel(y) for y, _ in corners], [pixel(x) for _, x in corners], frame.shape)
+        frame[rr, cc] = args.color
+    return np.flipud(frame)
+
+# Returns whether every pixel has both drawn and undrawn pixels of <mask> within <distance> pixels
+def nearEdge(mask, distance):
+    windows = np.lib.stride_tricks.sliding_window_view(np.pad(mask, distance, mode="edge"), (2*distance + 1, 2*distance + 1))
+    return np.any(windows, axis=(-2, -1)) & ~np.all(windows, axis=(-2, -1))
+
+def test_radialStyles():
+    # The polar map draws the same shapes as the original renderer. They differ only within 2 px of the edges, as the original rounds
+    # the corners of its polygons down to whole pixels. Without the rounding, at most 2% of the drawn pixels differ
+    for style in ["bars", "line", "fill"]:
+        for argsList in [[], ['-cc', '180', '-rt', '-90']]:
+            sys.argv = ['AudioSpectrumVisualizer.py', 'inputfile', 'destination', '-w', '480', '-ht', '270', '-b', '24', '-is', '-r', '-st', style] + argsList
+            args = arguments.initArgs()
+            arguments.processArgs(args, 1, 10, 44100)
+            bins = np.random.default_rng(2).random((1, 3, args.bins)).astype(np.float32)
+            frames = styles.renderChunk(args, styles.createRenderPlan(args), bins, 0, bins.shape[1])
+
+            for j in range(bins.shape[1]):
+                drawn = np.any(frames[j] != args.backgroundColor, axis=-1)
+                reference = np.any(drawRadialPolygons(args, bins, j) != args.backgroundColor, axis=-1)
+                assert not np.any((drawn != reference) & ~nearEdge(drawn, 2) & ~nearEdge(reference, 2)), (style, argsList, j)
+                exact = np.any(drawRadialPolygons(args, bins, j, True) != args.backgroundColor, axis=-1)
+                assert np.sum(drawn != exact) <= 0.02*np.sum(drawn | exact), (style, argsList, j)
+
+def test_styleInvariants():
+    for name in STYLE_CASES:
+        args, frames = renderStyleCase(name)
+        isColor = np.all(frames == args.color, axis=-1)
+        isBackground = np.all(frames == args.backgroundColor, axis=-1)
+        assert np.all(isColor | isBackground), name                 # Nothing but the bins is drawn onto the background
+
+        if args.style in ["bars", "fill"] and args.barHeight == -1:
+            assert not np.any(isColor[0]), name                     # Silence draws nothing
+        if args.style == "fill" and not args.radial:
+            assert np.all(isColor[1]), name                         # Full bins fill the whole frame
+        if args.mirror == 1 and args.channel != "stereo":
+            assert np.array_equal(frames, frames[:,::-1]), name     # Mirrored at the middle
+        if args.radial and args.style != "line":
+            rows, columns = np.nonzero(np.any(isColor, axis=0))
+            radii = np.hypot(rows - (args.height - 1)/2, columns - (args.width - 1)/2)
+            assert np.all(radii <= args.radiusEnd + 1), name        # Bins stay within the outer radius
+
+    # Bars of full bins cover the whole height of their columns and leave the spacing between them empty
+    args, frames = renderStyleCase("bars")
+    columns = np.any(np.all(frames[1] == args.color, axis=-1), axis=0)
+    assert np.all(np.all(frames[1][:,columns] == args.color, axis=-1))
+    assert 0 < np.sum(columns) < args.width
@@ -1,4 +1,6 @@
 from color import hex2rgb							# Handles colors
+from cache import defaultDirectory					# Location of the analysis cache
+from images import IMAGE_FORMATS					# Formats of image sequences
 
 import argparse
 import sys
@@ -31,11 +33,14 @@ def initArgs():
 	parser.add_argument("-ps", "--preset", type=str, default="default",
 						help="Name of a preset defined as a collection of flags in presets.txt. Default: default")
 
+	parser.add_argument("-tg", "--target", dest="targets", nargs=3, action="append", metavar=("PRESET", "SIZE", "DESTINATION"),
+						help="Renders an output with the flags of <PRESET>, the size <SIZE> (e.g. 1920x540) and the destination <DESTINATION> instead of the destination given. Can be given several times, the audio is only analyzed once for all targets that share the analysis. Default: None")
+
 	parser.add_argument("-ht", "--height", type=int, default=540,
-						help="Height of the output video/images in px. Default: 540")
+						help="Height of the output video/images in px. An odd height is padded by one row of the background color in videos, as the video codec requires even dimensions. Default: 540")
 
 	parser.add_argument("-w", "--width", type=int, default=1920,
-						help="Width of the output video/images in px. Will be overwritten if both binWidth AND binSpacing is given! Default: 1920")
+						help="Width of the output video/images in px. Will be overwritten if both binWidth AND binSpacing is given! An odd width is padded by one column of the background color in videos, as the video codec requires even dimensions. Default: 1920")
 
 	parser.add_argument("-b", "--bins", type=int, default=64,
 						help="Amount of bins (bars, points, etc). Default: 64")
@@ -79,6 +84,36 @@ def initArgs():
 	parser.add_argument("-is", "--imageSequence", action='store_true', default=False,
 						help="Export visualization as frame-by-frame image sequence instead of video with audio. Default: False")
 
+	parser.add_argument("-if", "--imageFormat", type=str, default="png",
+						help="Format of the images of an image sequence: png, bmp, ppm, npy (all frames in one array file, frames.npy). Default: png")
+
+	parser.add_argument("-pc", "--pngCompression", type=int, default=1,
+						help="Compression level of PNG images from 0 (none) to 9 (smallest files, slowest). Default: 1")
+
+	parser.add_argument("-vc", "--videoCodec", type=str, default="libx264",
+						help="Video codec used by ffmpeg to encode the video. Default: libx264")
+
+	parser.add_argument("-crf", type=float, default=16,
+						help="Constant rate factor of the video codec (Lower values result in higher quality). Default: 16")
+
+	parser.add_argument("-ep", "--encoderPreset", type=str, default="ultrafast",
+						help="Preset of the video codec (Slower presets result in smaller files). Default: ultrafast")
+
+	parser.add_argument("-pg", "--progress", type=str, default="bar",
+						help="How rendering progress is reported: bar, json (one JSON object per line on stdout with frames done, fps and ETA, all other messages go to stderr), none. Default: bar")
+
+	parser.add_argument("-sm", "--stream", action='store_true', default=False,
+						help="Reads raw PCM from <filename> (- for stdin, or a FIFO) and writes every frame as raw BGR video to stdout as soon as its audio has arrived. Default: False")
+
+	parser.add_argument("-sr", "--samplerate", type=int, default=44100,
+						help="Samplerate of the PCM read when streaming. Default: 44100")
+
+	parser.add_argument("-ac", "--audioChannels", type=int, default=2,
+						help="Number of interleaved channels of the PCM read when streaming. Default: 2")
+
+	parser.add_argument("-sf", "--sampleFormat", type=str, default="s16le",
+						help="Sample format of the PCM read when streaming: s16le, s32le, f32le. Default: s16le")
+
 	# Optional arguments - Style
 	parser.add_argument("-t", "--test", action='store_true', default=False,
 						help="Renders only a single frame for style testing. Default: False")
@@ -124,7 +159,25 @@ def initArgs():
 						help="Amount of frames cached before clearing (Higher chunk size lowers render time, but increases RAM usage). Default: 128")
 
 	parser.add_argument("-p", "--processes", type=int, default=-1,
-						help="Number of processes to use for rendering and export. Default: Number of processor cores (or hyperthreads, if applicable)")
+						help="Number of processes to use for the analysis, rendering and export. Default: Number of processor cores (or hyperthreads, if applicable)")
+
+	parser.add_argument("-cd", "--cacheDirectory", type=str, default="",
+						help="Directory in which the analysis of audio files is cached for later renders. Default: AudioSpectrumVisualizer in the user's cache directory")
+
+	parser.add_argument("-csz", "--cacheSize", type=float, default=1024,
+						help="Maximum size of the analysis cache in MB. Least recently used results are deleted first, 0 disables the cache. Default: 1024")
+
+	parser.add_argument("-csp", "--cacheSpectra", action='store_true', default=False,
+						help="Also caches the frame data, so renders with other bins skip the transform. It holds the whole spectrogram in memory and on disk. Default: False")
+
+	parser.add_argument("-res", "--resume", action='store_true', default=False,
+						help="Continues an interrupted render into the same destination with the same arguments, only rendering the segments that are missing. Default: False")
+
+	parser.add_argument("-pf", "--profile", action='store_true', default=False,
+						help="Writes a JSON report of the time and memory of every stage and of every render process next to the output (or every target). Default: False")
+
+	parser.add_argument("-pw", "--profileWorker", type=int, default=-1,
+						help="Runs render process <n> under cProfile when profiling and saves its statistics next to the output (or every target). Default: -1 (none)")
 
 
 	# Parse arguments once to get preset flag
@@ -139,8 +192,34 @@ def initArgs():
 	# Parse arguments a second time after appending flags specified by preset
 	args = parser.parse_args()
 
+	if args.targets:
+		presetArgv = sys.argv
+		args.targets = [parseTarget(parser, userArgs, target) for target in args.targets]
+		sys.argv = presetArgv
+
 	return args
 
+"""
+Returns the arguments of the output target <target> (preset, size and destination).
+They are parsed like the arguments of a render of their own: the flags of the preset, overridden by the flags given by the user.
+"""
+def parseTarget(parser, userArgs, target):
+	preset, size, destination = target
+	sys.argv = userArgs[0:1] + parsePreset(userArgs[0], preset) + userArgs[1:]
+	targetArgs = parser.parse_args()
+
+	try:
+		width, height = [int(length) for length in size.lower().split("x")]
+	except ValueError:
+		exit("Size of a target must be given as <width>x<height>, e.g. 1920x540.")
+
+	targetArgs.preset = preset
+	targetArgs.width = width
+	targetArgs.height = height
+	targetArgs.destination = destination
+	targetArgs.targets = None
+	return targetArgs
+
 def parsePreset(scriptDirectory, argPreset):
 	pathToPresets = changePath(scriptDirectory, "presets.txt")
 	presetsFile = open(pathToPresets)
@@ -166,7 +245,7 @@ def changePath(pathToExec, filename):
 """
 Exits on invalid inputs and processes arguments that can not be calculated independently.
 """
-def processArgs(args, fileData, samplerate):
+def processArgs(args, numChannels, audioLength, samplerate):
 	# Exit on invalid input
 	if args.bins <= 0:
 		exit("Must have at least one bin.")
@@ -183,9 +262,39 @@ def processArgs(args, fileData, samplerate):
 	if args.channel not in ["left", "right", "average", "stereo"]:
 		exit("Invalid channel. Valid channels: left, right, average, stereo.")
 
-	if len(fileData.shape) == 1 and args.channel == "stereo":
+	if numChannels == 1 and args.channel == "stereo":
 		exit("Audio only has a single channel. Valid channels: left, right, average.")
 
+	if args.imageFormat not in IMAGE_FORMATS:
+		exit("Invalid image format. Valid formats: " + ", ".join(IMAGE_FORMATS) + ".")
+
+	if args.pngCompression < 0 or args.pngCompression > 9:
+		exit("PNG compression level must be between 0 and 9.")
+
+	if args.crf < 0:
+		exit("Constant rate factor must be 0 or higher.")
+
+	if args.progress not in ["bar", "json", "none"]:
+		exit("Invalid progress mode. Valid modes: bar, json, none.")
+
+	if args.stream and args.samplerate <= 0:
+		exit("Samplerate must be at least 1.")
+
+	if args.stream and args.audioChannels <= 0:
+		exit("Audio must have at least one channel.")
+
+	if args.stream and args.sampleFormat not in ["s16le", "s32le", "f32le"]:
+		exit("Invalid sample format. Valid formats: s16le, s32le, f32le.")
+
+	if args.stream and (args.imageSequence or args.test):
+		exit("Streaming writes raw video to stdout and can not be combined with an image sequence or style testing.")
+
+	if args.targets and (args.stream or args.test):
+		exit("Targets can not be combined with streaming or style testing.")
+
+	if args.targets and len(set(path.normpath(target.destination) for target in args.targets)) < len(args.targets):
+		exit("Every target must have its own destination.")
+
 	if args.style not in ["bars", "circles", "donuts", "line", "fill"]:
 		exit("Style not recognized. Available styles: bars, circles, donuts, line, fill.")
 
@@ -220,8 +329,8 @@ def processArgs(args, fileData, samplerate):
 			exit("Duration must be longer than 0ms.")
 
 	if args.duration != -1 and not args.test:
-		if args.duration/1000 > len(fileData)/samplerate:
-			exit("Duration must not be longer than audio length of " + str(format(len(fileData)/samplerate, ".3f")) + "s.")
+		if args.duration/1000 > audioLength:
+			exit("Duration must not be longer than audio length of " + str(format(audioLength, ".3f")) + "s.")
 
 	if args.smoothY != "auto" :
 		if int(args.smoothY) < 0:
@@ -236,12 +345,12 @@ def processArgs(args, fileData, samplerate):
 			exit("End time must be later than 0.")
 
 	if args.start != 0:
-		if args.start >= len(fileData)/samplerate:
-			exit("Start time exceeds audio length of " + str(format(len(fileData)/samplerate, ".3f")) + "s.")
+		if args.start >= audioLength:
+			exit("Start time exceeds audio length of " + str(format(audioLength, ".3f")) + "s.")
 
 	if args.end != -1 and not args.test:
-		if args.end > len(fileData)/samplerate:
-			exit("End time exceeds audio length of " + str(format(len(fileData)/samplerate, ".3f")) + "s.")
+		if args.end > audioLength:
+			exit("End time exceeds audio length of " + str(format(audioLength, ".3f")) + "s.")
 
 	if args.start != 0 and args.end != -1:
 		if args.start >= args.end:
@@ -299,6 +408,12 @@ def processArgs(args, fileData, samplerate):
 	if args.processes == 0 or args.processes < -1:
 		exit("Number of processes must be at least 1")
 
+	if args.cacheSize < 0:
+		exit("Cache size must be 0MB or higher.")
+
+	if args.profileWorker < -1:
+		exit("Profiled process must be 0 or higher.")
+
 	# Process optional arguments:
 	if args.test:
 		args.framerate = 30												# Forces framerate when style testing
@@ -351,7 +466,7 @@ def processArgs(args, fileData, samplerate):
 		args.start = args.start
 
 	if args.end == -1 or args.test == 1:			# Ends render at <end> seconds. If end=-1: Renders to the end of the sound file. Default: -1
-		args.end = len(fileData)/samplerate
+		args.end = audioLength
 	else:
 		args.end = args.end
 
@@ -403,6 +518,12 @@ def processArgs(args, fileData, samplerate):
 	if args.chunkSize == -1:
 		args.chunkSize = int(DEFAULT_CHUNKSIZE/args.processes)
 
-	if not args.imageSequence:			# cv2 uses BGR instead of RGB and there is no setting in the videowriter to fix that
+	if args.profileWorker >= args.processes:
+		exit("Profiled process must be lower than the number of processes (" + str(args.processes) + ").")
+
+	if args.cacheDirectory == "":
+		args.cacheDirectory = defaultDirectory()
+
+	if not args.imageSequence:			# Frames are piped to ffmpeg as BGR instead of RGB
 		args.color.reverse()			# so we have to convert the colors ourselves as long as we don't export images
 		args.backgroundColor.reverse()
@@ -0,0 +1,149 @@
+"""
+Probes and decodes audio files by reading raw PCM from an ffmpeg subprocess.
+"""
+
+import json
+import numpy as np
+import subprocess
+from sys import exit, stderr
+
+DECODE_BLOCKSIZE = 2**18							# Number of samples per channel read from ffmpeg at once
+PCM_FORMATS = {										# Raw PCM sample formats (named like ffmpeg's) and the value of full scale
+	"s16le": (np.dtype("<i2"), 2**15),
+	"s32le": (np.dtype("<i4"), 2**31),
+	"f32le": (np.dtype("<f4"), 1)
+}
+
+
+"""
+Reads the samplerate, number of channels and length in seconds of the first audio stream of <filename> without decoding it.
+"""
+def probeAudio(filename):
+	arguments = [
+		'ffprobe',
+		'-v', 'error',
+		'-select_streams', 'a:0',
+		'-show_entries', 'stream=sample_rate,channels:format=duration',
+		'-of', 'json',
+		filename
+	]
+
+	try:
+		result = subprocess.run(arguments, capture_output=True, text=True)
+	except FileNotFoundError:
+		exit("ffprobe not found. Make sure ffmpeg is installed.")
+
+	if result.returncode != 0:
+		exit("Audio file could not be read: " + result.stderr.strip())
+
+	metadata = json.loads(result.stdout)
+	if not metadata.get("streams"):
+		exit("File does not contain an audio stream.")
+
+	stream = metadata["streams"][0]
+	samplerate = int(stream["sample_rate"])
+	numChannels = int(stream["channels"])
+	try:
+		audioLength = float(metadata.get("format", {}).get("duration"))
+	except (TypeError, ValueError):				# No duration, or "N/A" for streams without a known length
+		exit("Length of the audio file could not be determined.")
+
+	return samplerate, numChannels, audioLength
+
+
+"""
+Returns the ffmpeg filter arguments that mix the <numChannels> channels of the file down to the channel(s) chosen by args.channel,
+and the number of channels that are decoded.
+"""
+def channelLayout(args, numChannels):
+	if numChannels == 1 or args.channel == "stereo":
+		return [], numChannels
+
+	if args.channel == "left":
+		pan = "c0=c0"
+	elif args.channel == "right":
+		pan = "c0=c1"
+	else:
+		pan = "c0=" + "+".join(str(1/numChannels) + "*c" + str(i) for i in range(numChannels))
+
+	return ['-af', 'pan=mono|' + pan], 1
+
+
+"""
+Decodes <filename> with ffmpeg and yields the audio in blocks of <blockSize> samples as float32 arrays.
+Blocks have the shape (samples,) for a single decoded channel and (samples, channels) otherwise.
+If <seekStart>/<seekEnd> (in seconds) are given, ffmpeg seeks to <seekStart> and stops at <seekEnd>, so only that range is decoded.
+Only one block is held in memory at a time.
+"""
+def streamAudio(args, filename, samplerate, numChannels, seekStart=0, seekEnd=None, blockSize=DECODE_BLOCKSIZE):
+	filterArgs, decodedChannels = channelLayout(args, numChannels)
+
+	arguments = [
+		'ffmpeg',
+		'-hide_banner',
+		'-loglevel', 'error',
+	]
+
+	if seekStart > 0:
+		arguments += ['-ss', str(seekStart)]
+	arguments += ['-i', filename]
+	if seekEnd is not None:
+		arguments += ['-t', str(seekEnd - seekStart)]
+
+	arguments += [
+		'-vn',
+		*filterArgs,
+		'-ac', str(decodedChannels),
+		'-ar', str(samplerate),
+		'-f', 'f32le',
+		'-'
+	]
+
+	proc = subprocess.Popen(arguments, stdout=subprocess.PIPE, stderr=stderr)
+
+	blockBytes = blockSize * decodedChannels * 4
+	try:
+		while True:
+			data = proc.stdout.read(blockBytes)
+			if not data:
+				break
+
+			block = np.frombuffer(data, dtype=np.float32)
+			if decodedChannels > 1:
+				block = block.reshape(-1, decodedChannels)
+			yield block
+	finally:
+		proc.stdout.close()
+		if proc.poll() is None:						# Consumer stopped early
+			proc.kill()
+		returnCode = proc.wait()
+
+	if returnCode != 0:
+		exit("ffmpeg exited with a failure while decoding the audio.")
+
+
+"""
+Reads raw interleaved PCM of <numChannels> channels in <sampleFormat> from the binary file object <source> (e.g. stdin or a FIFO)
+and yields it in blocks of <blockSize> samples as float32 arrays, shaped like the blocks of streamAudio.
+Every block is yielded as soon as it has arrived, so a small block size keeps the latency low. Stops at the end of the input.
+"""
+def readPcm(source, numChannels, sampleFormat, blockSize):
+	dtype, fullScale = PCM_FORMATS[sampleFormat]
+	sampleBytes = dtype.itemsize * numChannels
+
+	pending = b""										# Bytes of an incomplete sample left over from the last read
+	while True:
+		data = source.read(blockSize*sampleBytes - len(pending))
+		if not data:
+			break
+
+		data = pending + data
+		usable = len(data) - len(data) % sampleBytes
+		pending = data[usable:]
+		if usable == 0:
+			continue
+
+		block = (np.frombuffer(data[:usable], dtype=dtype) / np.float32(fullScale)).astype(np.float32)
+		if numChannels > 1:
+			block = block.reshape(-1, numChannels)
+		yield block
@@ -0,0 +1,370 @@
+"""
+Benchmarks the stages of the visualizer on deterministic synthetic audio: decoding, the analysis into frame data and bins, and the bins
+and smoothing of cached frame data for every length and channel layout, rendering of every style and mode, and the export of rendered frames.
+Reports the wall time of every stage, frames per second and peak memory, and compares them against a stored baseline.
+
+Example: python benchmark.py -l 60 3600 -ch mono stereo -o results.json -bl baseline.json
+"""
+
+import argparse
+import json
+import numpy as np
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import wave
+from time import perf_counter
+from types import SimpleNamespace
+
+import arguments
+import AudioSpectrumVisualizer as visualizer
+from audio import DECODE_BLOCKSIZE, streamAudio
+from images import WRITER_THREADS
+from pipeline import closeFrameRing, openFrameRing
+from profiling import peakMemory, stage, stageEntry, startProfile, startWorkerProfile
+from shared import releaseArrays
+from styles import createRenderPlan, renderChunk
+
+SAMPLERATE = 44100
+SYNTHETIC_PERIOD = 10								# Length of the synthetic audio in seconds before it repeats
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "AudioSpectrumVisualizer.py")	# Presets are looked up next to it
+
+RENDER_CASES = {									# Style and mode combinations that are rendered, as visualizer arguments
+	"bars": [],
+	"circles": ["-st", "circles"],
+	"donuts": ["-st", "donuts"],
+	"line": ["-st", "line"],
+	"fill": ["-st", "fill"],
+	"bars-mirror": ["-m", "1"],
+	"line-mirror": ["-st", "line", "-m", "2"],
+	"bars-radial": ["-r"],
+	"line-radial": ["-r", "-st", "line"],
+	"fill-radial": ["-r", "-st", "fill"],
+	"bars-stereo": ["-ch", "stereo"],
+	"fill-stereo": ["-ch", "stereo", "-st", "fill"],
+	"bars-radial-stereo": ["-r", "-ch", "stereo"],
+}
+
+
+"""
+Parses the arguments of the benchmark.
+"""
+def initBenchmarkArgs():
+	parser = argparse.ArgumentParser(description="Benchmarks the visualizer on synthetic audio.")
+
+	parser.add_argument("-l", "--lengths", type=float, nargs="+", default=[60],
+						help="Lengths of the synthetic audio in seconds. Default: 60")
+
+	parser.add_argument("-ch", "--channels", type=str, nargs="+", default=["mono", "stereo"],
+						help="Channel layouts of the synthetic audio: mono, stereo. Default: mono stereo")
+
+	parser.add_argument("-f", "--frames", type=int, default=300,
+						help="Number of frames rendered for every style. Default: 300")
+
+	parser.add_argument("-ht", "--height", type=int, default=1080,
+						help="Height of the rendered frames in px. Default: 1080")
+
+	parser.add_argument("-w", "--width", type=int, default=1920,
+						help="Width of the rendered frames in px. Default: 1920")
+
+	parser.add_argument("-b", "--bins", type=int, default=64,
+						help="Amount of bins. Default: 64")
+
+	parser.add_argument("-p", "--processes", type=int, default=1,
+						help="Number of processes the analysis runs in. Default: 1")
+
+	parser.add_argument("-o", "--output", type=str,
+						help="Writes the results as JSON to this file, e.g. to be used as a baseline later.")
+
+	parser.add_argument("-bl", "--baseline", type=str,
+						help="Compares the results against the results in this JSON file and exits with 1 on regressions.")
+
+	parser.add_argument("-th", "--threshold", type=float, default=0.1,
+						help="Relative slowdown that counts as a regression. Default: 0.1 (10%%)")
+
+	benchmarkArgs = parser.parse_args()
+
+	for layout in benchmarkArgs.channels:
+		if layout not in ["mono", "stereo"]:
+			exit("Channel layouts must be mono or stereo.")
+
+	if min(benchmarkArgs.lengths) <= 0:
+		exit("Lengths must be longer than 0s.")
+
+	if benchmarkArgs.frames < 1:
+		exit("Number of frames must be at least 1.")
+
+	if benchmarkArgs.processes < 1:
+		exit("Number of processes must be at least 1.")
+
+	return benchmarkArgs
+
+
+"""
+Creates the visualizer arguments from the command line arguments in <argsList> for audio of <numChannels> channels and <audioLength> seconds,
+and makes them the arguments of the visualizer.
+"""
+def visualizerArgs(argsList, numChannels, audioLength):
+	sys.argv = [SCRIPT, "benchmark", "benchmark", "-p", "1", "-cs", "32", "-csz", "0"] + argsList
+	args = arguments.initArgs()
+	arguments.processArgs(args, numChannels, audioLength, SAMPLERATE)
+	visualizer.args = args
+	return args
+
+
+"""
+Returns SYNTHETIC_PERIOD seconds of deterministic synthetic audio of shape (samples,) or (samples, channels).
+The audio is a mix of sine sweeps, a beat of decaying tones and noise, so every bin changes from frame to frame.
+"""
+def syntheticAudio(numChannels):
+	t = np.arange(int(SYNTHETIC_PERIOD*SAMPLERATE))/SAMPLERATE
+	rng = np.random.default_rng(0)
+
+	channels = []
+	for channel in range(numChannels):
+		sweep = np.sin(2*np.pi*(50 + 400*channel)*t*(1 + t/2))
+		beat = np.sin(2*np.pi*(110*(channel + 1))*t)*np.exp(-8*(t % 0.5))
+		noise = rng.standard_normal(len(t))*0.1
+		channels.append((0.4*sweep + 0.4*beat + noise).astype(np.float32))
+
+	if numChannels == 1:
+		return channels[0]
+	return np.stack(channels, axis=1)
+
+
+"""
+Yields <audioLength> seconds of synthetic audio with <numChannels> channels in blocks, like audio.streamAudio.
+The synthetic audio repeats, so generating it does not add to the time of the analysis.
+"""
+def syntheticBlocks(audioLength, numChannels, blockSize=DECODE_BLOCKSIZE):
+	audio = syntheticAudio(numChannels)
+	numSamples = int(audioLength*SAMPLERATE)
+	for blockStart in range(0, numSamples, blockSize):
+		yield np.take(audio, np.arange(blockStart, min(blockStart + blockSize, numSamples)), axis=0, mode="wrap")
+
+
+"""
+Writes the synthetic audio to the 16 bit wave file <filename>, so the decoding through ffmpeg can be timed.
+"""
+def writeWave(filename, audioLength, numChannels):
+	with wave.open(filename, "wb") as file:
+		file.setnchannels(numChannels)
+		file.setsampwidth(2)
+		file.setframerate(SAMPLERATE)
+		for block in syntheticBlocks(audioLength, numChannels):
+			file.writeframes((np.clip(block, -1, 1)*32767).astype("<i2").tobytes())
+
+
+"""
+Converts <memory> in bytes to MB, or returns None if it is not available.
+"""
+def megabytes(memory):
+	return None if memory is None else round(memory/1024**2, 1)
+
+
+"""
+Runs <function> as stage <name> of <profile> and returns its result and a record of its wall time and the peak memory while it ran.
+The peak memory is that of this process, where it can not be sampled it is the peak of the process so far.
+"""
+def timed(profile, name, function, *functionArgs):
+	with stage(profile, name):
+		result = function(*functionArgs)
+	entry = stageEntry(profile, name)
+	return result, {"seconds": round(entry["wall"], 4), "peakMemoryMB": megabytes(entry["peakMemory"])}
+
+
+"""
+Consumes the audio decoded by ffmpeg. Returns the number of decoded samples.
+"""
+def decodeAll(args, filename, numChannels):
+	return sum(len(block) for block in streamAudio(args, filename, SAMPLERATE, numChannels))
+
+
+"""
+Times decoding and the analysis of <audioLength> seconds of audio in the channel layout <layout> across <benchmarkArgs.processes> processes,
+and the bins and smoothing that follow when the frame data is loaded from the cache. Returns the records of the stages and the bins.
+"""
+def benchmarkAnalysis(benchmarkArgs, audioLength, layout, directory):
+	numChannels = 1 if layout == "mono" else 2
+	args = visualizerArgs(["-b", str(benchmarkArgs.bins), "-sy", "auto", "-ch", "average" if layout == "mono" else "stereo"], numChannels, audioLength)
+	args.processes = benchmarkArgs.processes
+	profile = startProfile(SimpleNamespace(profile=True))
+	records = {}
+
+	if shutil.which("ffmpeg"):
+		filename = os.path.join(directory, layout + ".wav")
+		writeWave(filename, audioLength, numChannels)
+		_, records["decode"] = timed(profile, "decode", decodeAll, args, filename, numChannels)
+		os.remove(filename)
+
+	(bins, frameData, sharedMemory), records["analysis"] = timed(profile, "analysis", visualizer.analyzeAudio, syntheticBlocks(audioLength, numChannels), SAMPLERATE, numChannels, 0, True)
+	bins = np.array(bins)
+	_, records["bins"] = timed(profile, "bins", visualizer.createBins, frameData)
+	_, records["smoothing"] = timed(profile, "smoothing", visualizer.smoothBinData, bins)
+	del frameData
+	releaseArrays(sharedMemory)
+
+	profile.stopEvent.set()
+	return records, bins
+
+
+"""
+Renders <benchmarkArgs.frames> frames of <bins> with the style and mode given by <argsList>. Returns the frames per second.
+"""
+def renderFps(benchmarkArgs, argsList, bins, audioLength):
+	args = visualizerArgs(["-ht", str(benchmarkArgs.height), "-w", str(benchmarkArgs.width), "-b", str(benchmarkArgs.bins)] + argsList, len(bins), audioLength)
+	plan = createRenderPlan(args)
+	renderChunk(args, plan, bins, 0, min(args.chunkSize, benchmarkArgs.frames))		# Allocates the frame buffer outside of the timing
+
+	startTime = perf_counter()
+	for start in range(0, benchmarkArgs.frames, args.chunkSize):
+		renderChunk(args, plan, bins, start, min(start + args.chunkSize, benchmarkArgs.frames))
+	return round(benchmarkArgs.frames/(perf_counter() - startTime), 2)
+
+
+"""
+Renders bars and exports them like the visualizer does: piped to the video encoder, or as image sequence.
+Returns the frames per second of both.
+"""
+def exportFps(benchmarkArgs, bins, audioLength, directory):
+	records = {}
+	modes = [("video", [], benchmarkArgs.frames)] if shutil.which("ffmpeg") else []
+	modes.append(("imageSequence", ["-is"], min(benchmarkArgs.frames, 60)))
+
+	for name, argsList, numFrames in modes:
+		args = visualizerArgs(["-ht", str(benchmarkArgs.height), "-w", str(benchmarkArgs.width), "-b", str(benchmarkArgs.bins)] + argsList, 1, audioLength)
+		args.destination = directory
+		startTime = perf_counter()
+		exportFrames(args, bins, numFrames)
+		records[name] = {"fps": round(numFrames/(perf_counter() - startTime), 2)}
+
+	return records
+
+
+"""
+Renders and exports the first <numFrames> frames of <bins> as one segment, through the frame ring of a render process.
+"""
+def exportFrames(args, bins, numFrames):
+	plan = createRenderPlan(args)
+	ring = openFrameRing(args, WRITER_THREADS if args.imageSequence else 1, visualizer.saveFrames)
+	visualizer.renderSaveSegment(0, (0, numFrames), bins, plan, ring, np.zeros(1), startWorkerProfile(args, 0))
+	closeFrameRing(ring)
+
+
+"""
+Normalizes <bins> like the visualizer does before rendering and returns the first <numFrames> frames.
+The bins are repeated if the audio has fewer frames.
+"""
+def renderBins(bins, numFrames):
+	bins = bins/np.max(bins)
+	repeats = int(np.ceil(numFrames/bins.shape[1]))
+	return np.tile(bins, (1, repeats, 1))[:,:numFrames]
+
+
+"""
+Runs all benchmarks and returns the results.
+"""
+def runBenchmarks(benchmarkArgs):
+	results = {
+		"system": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(), "processor": platform.processor()},
+		"settings": {"height": benchmarkArgs.height, "width": benchmarkArgs.width, "bins": benchmarkArgs.bins, "frames": benchmarkArgs.frames, "processes": benchmarkArgs.processes},
+		"analysis": {},
+		"render": {},
+		"export": {},
+	}
+
+	renderInputs = {}
+	with tempfile.TemporaryDirectory() as directory:
+		for audioLength in benchmarkArgs.lengths:
+			for layout in benchmarkArgs.channels:
+				name = format(audioLength, "g") + "s-" + layout
+				print("Analysis: " + name)
+				results["analysis"][name], bins = benchmarkAnalysis(benchmarkArgs, audioLength, layout, directory)
+				if layout not in renderInputs:			# Rendering does not depend on the length, the shortest audio is used
+					renderInputs[layout] = (renderBins(bins, benchmarkArgs.frames), audioLength)
+				del bins
+
+		for name, argsList in RENDER_CASES.items():
+			layout = "stereo" if "stereo" in argsList else "mono"
+			if layout not in renderInputs:
+				continue
+			print("Render: " + name)
+			bins, audioLength = renderInputs[layout]
+			results["render"][name] = {"fps": renderFps(benchmarkArgs, argsList, bins, audioLength)}
+
+		if "mono" in renderInputs:
+			print("Export")
+			bins, audioLength = renderInputs["mono"]
+			results["export"] = exportFps(benchmarkArgs, bins, audioLength, directory)
+
+	results["processPeakMemoryMB"] = megabytes(peakMemory())
+	return results
+
+
+"""
+Returns the measurements of <results> as a flat dictionary of name: (value, higherIsBetter).
+"""
+def measurements(results):
+	flat = {}
+	for group in ["analysis", "render", "export"]:
+		for name, record in results.get(group, {}).items():
+			for stageName, value in record.items():
+				if isinstance(value, dict):			# Analysis records are grouped by stage
+					flat[group + "/" + name + "/" + stageName] = (value["seconds"], False)
+				elif stage == "fps":
+					flat[group + "/" + name] = (value, True)
+	return flat
+
+
+"""
+Compares <results> against <baseline>. Returns a list of regressions that are slower than the baseline by more than <threshold>.
+"""
+def compareResults(results, baseline, threshold):
+	regressions = []
+	current = measurements(results)
+	for name, (baseValue, higherIsBetter) in measurements(baseline).items():
+		if name not in current or baseValue <= 0 or current[name][0] <= 0:
+			continue
+
+		value = current[name][0]
+		slowdown = baseValue/value - 1 if higherIsBetter else value/baseValue - 1
+		if slowdown > threshold:
+			regressions.append((name, baseValue, value, slowdown))
+	return regressions
+
+
+"""
+Prints the results as a table.
+"""
+def printResults(results):
+	for name, record in results["analysis"].items():
+		for stageName, value in record.items():
+			print("{:<40}{:>12.3f} s{:>12} MB".format(name + " " + stageName, value["seconds"], str(value["peakMemoryMB"])))
+	for group in ["render", "export"]:
+		for name, record in results[group].items():
+			print("{:<40}{:>12.2f} fps".format(group + " " + name, record["fps"]))
+	print("Process peak memory: " + str(results["processPeakMemoryMB"]) + " MB")
+
+
+if __name__ == '__main__':
+	benchmarkArgs = initBenchmarkArgs()
+	results = runBenchmarks(benchmarkArgs)
+	printResults(results)
+
+	if benchmarkArgs.output:
+		with open(benchmarkArgs.output, "w") as file:
+			json.dump(results, file, indent=4)
+
+	if benchmarkArgs.baseline:
+		with open(benchmarkArgs.baseline) as file:
+			baseline = json.load(file)
+
+		regressions = compareResults(results, baseline, benchmarkArgs.threshold)
+		for name, baseValue, value, slowdown in regressions:
+			print("Regression: {} {} -> {} ({:.1%} slower)".format(name, baseValue, value, slowdown))
+
+		if regressions:
+			exit(1)
+		print("No regressions compared to the baseline.")
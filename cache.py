@@ -0,0 +1,112 @@
+"""
+Caches intermediate results of the analysis on disk, so the same audio can be rendered again with other styles without being analyzed again.
+Every entry is a .npy file named by a hash of the content of the audio file and of the arguments the result depends on.
+Entries are memory-mapped when loaded. Once the cache exceeds its size, the least recently used entries are deleted.
+"""
+
+import hashlib
+import json
+import numpy as np
+import os
+from os import path
+
+CACHE_VERSION = 2									# Changes whenever the analysis changes its results, so old entries are not used anymore
+HASH_BLOCKSIZE = 2**20								# Number of bytes of the audio file hashed at once
+
+SPECTRUM_ARGS = ["framerate", "duration", "channel", "start", "end", "frequencyStart", "frequencyEnd"]	# Arguments the frame data depends on
+BIN_ARGS = SPECTRUM_ARGS + ["bins", "xlog", "smoothY"]												# Arguments the bins depend on
+
+
+"""
+Returns the default cache directory in the user's cache folder.
+"""
+def defaultDirectory():
+	cacheHome = os.environ.get("XDG_CACHE_HOME") or path.join(path.expanduser("~"), ".cache")
+	return path.join(cacheHome, "AudioSpectrumVisualizer")
+
+
+"""
+Returns the hash of the content of <filename>.
+"""
+def fileHash(filename):
+	contentHash = hashlib.blake2b(digest_size=20)
+	with open(filename, "rb") as file:
+		while True:
+			data = file.read(HASH_BLOCKSIZE)
+			if not data:
+				break
+			contentHash.update(data)
+	return contentHash.hexdigest()
+
+
+"""
+Returns the name of the entry for <stage> of the audio with <contentHash>, depending on the arguments named in <argNames>.
+"""
+def entryKey(args, contentHash, stage, argNames):
+	description = {
+		"version": CACHE_VERSION,
+		"content": contentHash,
+		"stage": stage,
+		"args": {name: getattr(args, name) for name in argNames}
+	}
+	return stage + "-" + hashlib.blake2b(json.dumps(description, sort_keys=True).encode(), digest_size=20).hexdigest()
+
+
+"""
+Returns the cached array of <key> as a read-only memory map, or None if it is not cached.
+"""
+def loadEntry(directory, key):
+	filename = path.join(directory, key + ".npy")
+	try:
+		array = np.load(filename, mmap_mode="r")
+		os.utime(filename)								# Marks the entry as recently used
+	except (OSError, ValueError):
+		return None
+	return array
+
+
+"""
+Stores <array> as the entry of <key> and deletes the least recently used entries if the cache exceeds <maxSize> bytes.
+Arrays bigger than the whole cache are not stored.
+"""
+def storeEntry(directory, key, array, maxSize):
+	if array.nbytes > maxSize:
+		return
+
+	filename = path.join(directory, key + ".npy")
+	tempFilename = filename + "." + str(os.getpid()) + ".tmp"
+	try:
+		os.makedirs(directory, exist_ok=True)
+		with open(tempFilename, "wb") as file:
+			np.save(file, np.ascontiguousarray(array), allow_pickle=False)
+		os.replace(tempFilename, filename)				# Other processes only ever see complete entries
+	except OSError:
+		if path.exists(tempFilename):
+			os.remove(tempFilename)
+		return
+
+	evictEntries(directory, maxSize)
+
+
+"""
+Deletes the least recently used entries until the entries in <directory> take up no more than <maxSize> bytes.
+"""
+def evictEntries(directory, maxSize):
+	entries = []
+	for name in os.listdir(directory):
+		if name.endswith(".npy"):
+			try:
+				stat = os.stat(path.join(directory, name))
+			except OSError:								# Deleted by another process
+				continue
+			entries.append((stat.st_mtime, stat.st_size, name))
+
+	totalSize = sum(size for _, size, _ in entries)
+	for _, size, name in sorted(entries):
+		if totalSize <= maxSize:
+			break
+		try:
+			os.remove(path.join(directory, name))
+		except OSError:									# Still in use on some platforms, or deleted by another process
+			continue
+		totalSize -= size
@@ -0,0 +1,94 @@
+"""
+Writes the frames of an image sequence. Every process encodes and writes its frames on WRITER_THREADS writer threads of its frame ring,
+so rendering does not wait for compression or the disk.
+PNG and BMP are encoded with Pillow, PPM is written as is and npy stores all frames in a single array file that other tools can memory-map.
+"""
+
+import numpy as np
+from os import path
+from PIL import Image
+from sys import exit
+from types import SimpleNamespace
+
+IMAGE_FORMATS = ["png", "bmp", "ppm", "npy"]
+WRITER_THREADS = 2									# Number of threads encoding and writing images in every process
+FRAMES_NAME = "frames.npy"							# Name of the array file of the npy format
+
+
+"""
+Creates the array file that the <numFrames> frames are written into if args.imageFormat is npy.
+An existing file of the same shape is kept, so a resumed render does not lose the frames already written.
+"""
+def createFrameFile(args, numFrames):
+	if args.imageFormat != "npy":
+		return
+
+	filename = path.join(args.destination, FRAMES_NAME)
+	shape = (numFrames, args.height, args.width, 3)
+	try:
+		if np.load(filename, mmap_mode="r").shape == shape:
+			return
+	except (OSError, ValueError):
+		pass
+
+	frames = np.lib.format.open_memmap(filename, mode="w+", dtype=np.uint8, shape=shape)
+	frames.flush()
+	del frames
+
+
+"""
+Returns the writer for writeImage and closeImageWriter that writes the frames of this process into args.destination.
+"""
+def openImageWriter(args):
+	writer = SimpleNamespace(
+		args=args,
+		frames=None
+	)
+
+	if args.imageFormat == "npy":
+		writer.frames = np.load(path.join(args.destination, FRAMES_NAME), mmap_mode="r+")
+
+	return writer
+
+
+"""
+Writes <frame> as frame number <index>. May be called from several threads at once.
+"""
+def writeImage(writer, frame, index):
+	if writer.frames is not None:
+		writer.frames[index] = frame
+	else:
+		try:
+			saveImage(writer.args, frame, imagePath(writer.args, index))
+		except OSError as error:
+			exit("Image could not be written: " + str(error))
+
+
+"""
+Makes sure all frames written to the array file of the npy format are on disk.
+"""
+def closeImageWriter(writer):
+	if writer.frames is not None:
+		writer.frames.flush()
+		del writer.frames
+
+
+"""
+Returns the path of the image of frame number <index>.
+"""
+def imagePath(args, index):
+	return path.join(args.destination, str(index) + "." + args.imageFormat)
+
+
+"""
+Encodes the RGB <frame> in args.imageFormat and saves it as <filename>.
+"""
+def saveImage(args, frame, filename):
+	if args.imageFormat == "png":
+		Image.fromarray(frame).save(filename, compress_level=args.pngCompression)
+	elif args.imageFormat == "bmp":
+		Image.fromarray(frame).save(filename)
+	else:
+		with open(filename, "wb") as file:
+			file.write("P6\n{} {}\n255\n".format(frame.shape[1], frame.shape[0]).encode())
+			file.write(np.ascontiguousarray(frame).data)
@@ -0,0 +1,70 @@
+"""
+Keeps track of the segments of a render that are done, so an interrupted render can be resumed.
+The manifest is a JSON file in the destination directory that records a hash of everything the frames depend on,
+the frame range of every segment and the segments that are completely written.
+"""
+
+import hashlib
+import json
+import os
+from os import path
+
+MANIFEST_VERSION = 1								# Changes whenever the layout of the manifest or the segments changes
+MANIFEST_NAME = "manifest.json"
+
+IGNORED_ARGS = ["destination", "preset", "test", "progress", "processes", "chunkSize", "cacheDirectory", "cacheSize",	# Arguments the frames do not depend on
+	"profile", "profileWorker", "resume", "targets", "stream", "samplerate", "audioChannels", "sampleFormat", "radialImage", "radialImageMask", "frameMask"]
+
+
+"""
+Returns the hash of the parameters of a render of <numFrames> frames of the audio with <contentHash>.
+<imageHash> is the hash of the content of the image (or None), as the image is only referenced by its path.
+"""
+def renderHash(args, contentHash, imageHash, numFrames):
+	description = {
+		"version": MANIFEST_VERSION,
+		"content": contentHash,
+		"image": imageHash,
+		"frames": numFrames,
+		"args": {name: value for name, value in vars(args).items() if name not in IGNORED_ARGS}
+	}
+	return hashlib.blake2b(json.dumps(description, sort_keys=True).encode(), digest_size=20).hexdigest()
+
+
+"""
+Returns the manifest in <directory>, or None if there is none or it can not be read.
+"""
+def loadManifest(directory):
+	try:
+		with open(path.join(directory, MANIFEST_NAME)) as file:
+			return json.load(file)
+	except (OSError, ValueError):
+		return None
+
+
+"""
+Writes <manifest> to <directory>. The manifest is replaced at once, so it is never left half-written.
+"""
+def writeManifest(directory, manifest):
+	filename = path.join(directory, MANIFEST_NAME)
+	tempFilename = filename + "." + str(os.getpid()) + ".tmp"
+	with open(tempFilename, "w") as file:
+		json.dump(manifest, file)
+	os.replace(tempFilename, filename)
+
+
+"""
+Records segment <segment> as completed in the manifest in <directory>. <lock> is shared by all processes writing to the manifest.
+"""
+def markCompleted(directory, segment, lock):
+	with lock:
+		manifest = loadManifest(directory)
+		manifest["completed"].append(segment)
+		writeManifest(directory, manifest)
+
+
+"""
+Deletes the manifest in <directory>.
+"""
+def removeManifest(directory):
+	os.remove(path.join(directory, MANIFEST_NAME))
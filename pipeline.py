@@ -0,0 +1,105 @@
+"""
+Overlaps rendering and writing within a render process. The renderer renders into a ring of preallocated frame buffers
+and writer threads drain the filled buffers into the video encoder or the image writer, so both are busy at the same time.
+The memory of a process is capped at the ring: the renderer waits whenever all buffers are still being written.
+"""
+
+import numpy as np
+from math import ceil
+from queue import Queue
+from threading import Thread
+from types import SimpleNamespace
+
+RING_SLOTS = 4										# Number of buffers in the ring of every process, together they hold args.chunkSize frames
+
+
+"""
+Allocates the ring of a render process and starts <numThreads> writer threads that call <writeSlot> with the frames of every filled buffer
+and the details it was filled with. Frames of one buffer are always written in order, frames of different buffers only if <numThreads> is 1.
+"""
+def openFrameRing(args, numThreads, writeSlot):
+	slotFrames = ceil(args.chunkSize/RING_SLOTS)
+	ring = SimpleNamespace(
+		slotFrames=slotFrames,
+		buffers=[np.empty((slotFrames, args.height, args.width, 3), dtype=np.uint8) for _ in range(RING_SLOTS)],
+		free=Queue(),
+		filled=Queue(),
+		writeSlot=writeSlot,
+		errors=[],
+		threads=[]
+	)
+
+	for slot in range(RING_SLOTS):
+		ring.free.put(slot)
+	for _ in range(numThreads):
+		thread = Thread(target=drainRing, args=(ring,), daemon=True)
+		thread.start()
+		ring.threads.append(thread)
+
+	return ring
+
+
+"""
+Waits for a buffer that is written and returns its number and the buffer to render up to ring.slotFrames frames into.
+Raises the error of a writer thread if a buffer could not be written.
+"""
+def takeSlot(ring):
+	slot = ring.free.get()
+	raiseErrors(ring)
+	return slot, ring.buffers[slot]
+
+
+"""
+Hands the first <numFrames> frames of buffer <slot> to the writer threads, which call ring.writeSlot with them and <details>.
+"""
+def fillSlot(ring, slot, numFrames, *details):
+	ring.filled.put((slot, numFrames, details))
+
+
+"""
+Writes the filled buffers until the ring is closed. Once a buffer could not be written, the remaining ones are only given back,
+so the renderer does not wait forever.
+"""
+def drainRing(ring):
+	while True:
+		item = ring.filled.get()
+		if item is None:
+			ring.filled.task_done()
+			return
+
+		slot, numFrames, details = item
+		if not ring.errors:
+			try:
+				ring.writeSlot(ring.buffers[slot][:numFrames], *details)
+			except BaseException as error:			# Includes exit() of the encoder, which would otherwise only end this thread
+				ring.errors.append(error)
+		ring.free.put(slot)
+		ring.filled.task_done()
+
+
+"""
+Waits until all filled buffers are written. Raises the error of a writer thread if a buffer could not be written.
+"""
+def flushRing(ring):
+	ring.filled.join()
+	raiseErrors(ring)
+
+
+"""
+Writes the remaining buffers and stops the writer threads.
+"""
+def closeFrameRing(ring):
+	for _ in ring.threads:
+		ring.filled.put(None)
+	for thread in ring.threads:
+		thread.join()
+	ring.buffers = []
+	raiseErrors(ring)
+
+
+"""
+Raises the first error of the writer threads in the rendering thread.
+"""
+def raiseErrors(ring):
+	if ring.errors:
+		raise ring.errors[0]
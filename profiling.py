@@ -0,0 +1,308 @@
+"""
+Collects the telemetry of a render for the profile report: wall time, CPU time and peak memory of every stage of the main process,
+the frames per second of every render process and how long every chunk spends rendering and writing its frames.
+The report is written as JSON next to the output.
+"""
+
+import cProfile
+import json
+import pstats
+from contextlib import contextmanager
+from sys import platform
+from threading import Event, Thread
+from time import perf_counter, process_time
+from types import SimpleNamespace
+
+try:
+	import resource										# Not available on Windows
+except ImportError:
+	resource = None
+
+MEMORY_INTERVAL = 0.01								# Seconds between two samples of the memory usage
+TOP_FUNCTIONS = 30									# Number of functions listed from the cProfile statistics of a render process
+
+
+"""
+Returns the current memory usage (resident set size) of this process in bytes, or None if it can not be read.
+"""
+def currentMemory():
+	try:
+		with open("/proc/self/statm") as statm:
+			return int(statm.read().split()[1]) * resource.getpagesize()
+	except (OSError, AttributeError, ValueError, IndexError):
+		return None
+
+
+"""
+Returns the peak memory usage of this process in bytes, or None if it can not be read.
+"""
+def peakMemory():
+	if resource is None:
+		return None
+	maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return maxrss if platform == "darwin" else maxrss*1024		# Bytes on macOS, kilobytes elsewhere
+
+
+"""
+Returns the CPU time in seconds of all terminated and waited for child processes (e.g. ffmpeg), or 0 if it can not be read.
+"""
+def childCpuTime():
+	if resource is None:
+		return 0
+	usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+	return usage.ru_utime + usage.ru_stime
+
+
+"""
+Starts profiling if <args.profile> is set. Returns the profile that stages are recorded in, or None if profiling is off.
+A sampler thread keeps track of the peak memory usage, as the operating system only reports the peak of the whole process.
+"""
+def startProfile(args):
+	if not args.profile:
+		return None
+
+	profile = SimpleNamespace(
+		stages=[],
+		startWall=perf_counter(),
+		startCpu=process_time(),
+		excludedWall=0,									# Time spent in nested stages (e.g. decoding within the frame data) that is not part of the enclosing stage
+		excludedCpu=0,
+		memoryPeak=currentMemory(),
+		stopEvent=Event()
+	)
+
+	if profile.memoryPeak is not None:
+		profile.sampler = Thread(target=sampleMemory, args=(profile,), daemon=True)
+		profile.sampler.start()
+	else:
+		profile.sampler = None
+
+	return profile
+
+
+"""
+Samples the memory usage every MEMORY_INTERVAL seconds and keeps the highest value until the profile is stopped.
+"""
+def sampleMemory(profile):
+	while not profile.stopEvent.wait(MEMORY_INTERVAL):
+		memory = currentMemory()
+		if memory is not None and memory > profile.memoryPeak:
+			profile.memoryPeak = memory
+
+
+"""
+Returns the peak memory usage since the last call and resets it to the current usage.
+Falls back to the peak of the whole process if the memory usage can not be sampled.
+"""
+def takeMemoryPeak(profile):
+	if profile.sampler is None:
+		return peakMemory()
+	peak = max(profile.memoryPeak, currentMemory() or 0)
+	profile.memoryPeak = currentMemory() or 0
+	return peak
+
+
+"""
+Records the wall time, CPU time, CPU time of child processes and peak memory of the code within as stage <name> of <profile>.
+Does nothing if <profile> is None.
+"""
+@contextmanager
+def stage(profile, name):
+	if profile is None:
+		yield
+		return
+
+	takeMemoryPeak(profile)
+	profile.excludedWall = 0
+	profile.excludedCpu = 0
+	startWall = perf_counter()
+	startCpu = process_time()
+	startChildCpu = childCpuTime()
+
+	yield
+
+	entry = stageEntry(profile, name)
+	entry["wall"] += perf_counter() - startWall - profile.excludedWall
+	entry["cpu"] += process_time() - startCpu - profile.excludedCpu
+	entry["childCpu"] = (entry["childCpu"] or 0) + childCpuTime() - startChildCpu
+	peak = takeMemoryPeak(profile)
+	if peak is not None:
+		entry["peakMemory"] = max(entry["peakMemory"] or 0, peak)
+
+
+"""
+Returns the entry of stage <name> of <profile>. Stages that are recorded more than once, like the cache or the analysis of several targets,
+are combined into one entry. The CPU time of child processes and the peak memory stay None for stages that do not record them.
+"""
+def stageEntry(profile, name):
+	for entry in profile.stages:
+		if entry["stage"] == name:
+			return entry
+	entry = {"stage": name, "wall": 0, "cpu": 0, "childCpu": None, "peakMemory": None}
+	profile.stages.append(entry)
+	return entry
+
+
+"""
+Adds the seconds of the <parts> of stage <name> to its entry, e.g. the time the analysis processes spent on each step of the analysis.
+Does nothing if <profile> is None.
+"""
+def recordParts(profile, name, parts):
+	if profile is None:
+		return
+
+	entry = stageEntry(profile, name)
+	entry.setdefault("parts", {})
+	for part, seconds in parts.items():
+		entry["parts"][part] = entry["parts"].get(part, 0) + seconds
+
+
+"""
+Yields the items of <iterator> and records the time spent waiting for them as stage <name> of <profile>.
+The time is excluded from the stage the iterator is consumed in, so producing and processing items are told apart
+even though they alternate. The CPU time of child processes and the memory stay with the enclosing stage.
+"""
+def timeIterator(profile, name, iterator):
+	if profile is None:
+		yield from iterator
+		return
+
+	entry = stageEntry(profile, name)				# Updated in place, as the iterator may not be consumed to its end
+	iterator = iter(iterator)
+	while True:
+		startWall = perf_counter()
+		startCpu = process_time()
+		try:
+			item = next(iterator)
+		except StopIteration:
+			return
+		finally:
+			wall = perf_counter() - startWall
+			cpu = process_time() - startCpu
+			entry["wall"] += wall
+			entry["cpu"] += cpu
+			profile.excludedWall += wall
+			profile.excludedCpu += cpu
+		yield item
+
+
+"""
+Starts the telemetry of a render process. Runs the process under cProfile if it is <args.profileWorker>.
+"""
+def startWorkerProfile(args, worker):
+	workerProfile = SimpleNamespace(
+		worker=worker,
+		startWall=perf_counter(),
+		startCpu=process_time(),
+		startChildCpu=childCpuTime(),
+		chunks=[],
+		profiler=None
+	)
+
+	if args.profile and args.profileWorker == worker:
+		workerProfile.profiler = cProfile.Profile()
+		workerProfile.profiler.enable()
+
+	return workerProfile
+
+
+"""
+Records that the chunk with frames <start> to <end> of segment <segment> waited <waitTime> seconds for a free buffer,
+took <renderTime> seconds to render and <writeTime> seconds to write. Writing overlaps with rendering the next chunks.
+"""
+def recordChunk(workerProfile, segment, start, end, waitTime, renderTime, writeTime):
+	workerProfile.chunks.append({"segment": segment, "start": start, "end": end, "wait": waitTime, "render": renderTime, "write": writeTime})
+
+
+"""
+Finishes the telemetry of a render process. The cProfile statistics are saved to <destination>.worker<n>.prof for every one of <destinations>.
+Returns the telemetry as a dictionary that can be sent to the main process.
+"""
+def finishWorkerProfile(args, workerProfile, destinations):
+	wall = perf_counter() - workerProfile.startWall
+	frames = sum(chunk["end"] - chunk["start"] for chunk in workerProfile.chunks)
+
+	telemetry = {
+		"worker": workerProfile.worker,
+		"frames": frames,
+		"wall": wall,
+		"cpu": process_time() - workerProfile.startCpu,
+		"encoderCpu": childCpuTime() - workerProfile.startChildCpu,
+		"fps": frames/wall if wall > 0 else None,
+		"wait": sum(chunk["wait"] for chunk in workerProfile.chunks),
+		"render": sum(chunk["render"] for chunk in workerProfile.chunks),
+		"write": sum(chunk["write"] for chunk in workerProfile.chunks),
+		"peakMemory": peakMemory(),
+		"chunks": workerProfile.chunks
+	}
+
+	if workerProfile.profiler is not None:
+		workerProfile.profiler.disable()
+		filenames = [destination + ".worker" + str(workerProfile.worker) + ".prof" for destination in destinations]
+		for filename in filenames:
+			workerProfile.profiler.dump_stats(filename)
+		telemetry["cProfile"] = {"files": filenames, "functions": topFunctions(workerProfile.profiler)}
+
+	return telemetry
+
+
+"""
+Returns the TOP_FUNCTIONS functions with the highest cumulative time from the statistics of <profiler>.
+"""
+def topFunctions(profiler):
+	stats = pstats.Stats(profiler).stats
+	functions = []
+	for (filename, line, function), (_, calls, totalTime, cumulativeTime, _) in stats.items():
+		functions.append({
+			"function": "{}:{}({})".format(filename, line, function),
+			"calls": calls,
+			"totalTime": totalTime,
+			"cumulativeTime": cumulativeTime
+		})
+	functions.sort(key=lambda entry: entry["cumulativeTime"], reverse=True)
+	return functions[:TOP_FUNCTIONS]
+
+
+"""
+Stops profiling and writes the report with the stages of <profile> and the telemetry of the render processes <workers>
+to <args.destination>.profile.json. With several targets, it is written for every target with the settings of the target,
+as all targets share the stages and processes. Returns the name of the report.
+"""
+def writeReport(args, profile, workers, numFrames):
+	profile.stopEvent.set()
+	if profile.sampler is not None:
+		profile.sampler.join()
+
+	wall = perf_counter() - profile.startWall
+	workers = sorted(workers or [], key=lambda telemetry: telemetry["worker"])
+	report = {
+		"settings": {
+			"style": args.style,
+			"radial": args.radial,
+			"channel": args.channel,
+			"width": args.width,
+			"height": args.height,
+			"framerate": args.framerate,
+			"frames": numFrames,
+			"processes": args.processes,
+			"chunkSize": args.chunkSize,
+			"imageSequence": args.imageSequence,
+			"targets": [target.destination for target in args.targets] if args.targets else None
+		},
+		"wall": wall,
+		"cpu": process_time() - profile.startCpu,
+		"fps": numFrames/wall if wall > 0 else None,
+		"peakMemory": peakMemory(),
+		"stages": profile.stages,
+		"render": {
+			"wait": sum(telemetry["wait"] for telemetry in workers),
+			"render": sum(telemetry["render"] for telemetry in workers),
+			"write": sum(telemetry["write"] for telemetry in workers),
+			"workers": workers
+		}
+	}
+
+	filename = args.destination + ".profile.json"
+	with open(filename, "w") as file:
+		json.dump(report, file, indent=1)
+	return filename
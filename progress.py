@@ -0,0 +1,85 @@
+"""
+Tracks the rendering progress of all processes.
+Every process counts its finished frames in its own slot of a shared array, a reporter thread in the main process sums the slots
+and redraws the progress at a fixed rate.
+"""
+
+import json
+import numpy as np
+from shared import attachArray, createArray, releaseArrays
+from sys import stdout
+from threading import Event, Thread
+from time import time
+
+REFRESH_INTERVAL = 0.25								# Seconds between two redraws of the progress
+
+
+"""
+Creates the shared progress slots for <numProcesses> processes and starts the reporter thread.
+Returns a handle for stopProgress and the descriptor that processes attach to with attachProgress.
+"""
+def startProgress(numProcesses, totalFrames, mode="bar"):
+	shm, slots, descriptor = createArray((numProcesses,), np.int64)
+	slots[:] = 0
+
+	stopEvent = Event()
+	reporter = Thread(target=reportProgress, args=(slots, totalFrames, mode, stopEvent), daemon=True)
+	reporter.start()
+
+	return (shm, slots, reporter, stopEvent), descriptor
+
+
+"""
+Stops the reporter thread after drawing the final progress and releases the progress slots.
+"""
+def stopProgress(handle):
+	shm, slots, reporter, stopEvent = handle
+	stopEvent.set()
+	reporter.join()
+	del slots
+	releaseArrays([shm])
+
+
+"""
+Attaches a process to the progress slots. Returns the shared memory block and the slots.
+"""
+def attachProgress(descriptor):
+	return attachArray(descriptor)
+
+
+"""
+Redraws the progress every REFRESH_INTERVAL seconds until <stopEvent> is set.
+JSON lines are always written to the standard output, even while the other messages of the render are sent to stderr.
+"""
+def reportProgress(slots, totalFrames, mode, stopEvent):
+	startTime = time()
+	while True:
+		stopped = stopEvent.wait(REFRESH_INTERVAL)
+
+		framesDone = int(np.sum(slots))
+		elapsed = time() - startTime
+		fps = framesDone/elapsed if elapsed > 0 else 0
+		eta = (totalFrames - framesDone)/fps if fps > 0 else None
+
+		if mode == "bar":
+			printProgressBar(framesDone, totalFrames)
+			if stopped:
+				print()								# New line after progress bar
+		elif mode == "json":
+			stdout.write(json.dumps({"framesDone": framesDone, "totalFrames": totalFrames, "fps": round(fps, 3), "eta": None if eta is None else round(eta, 3)}) + "\n")
+			stdout.flush()
+
+		if stopped:
+			return
+
+
+"""
+Progress Bar (Modified from https://stackoverflow.com/questions/3173320/text-progress-bar-in-the-console)
+"""
+def printProgressBar (iteration, total, prefix = "Progress:", suffix = "Complete", decimals = 2, length = 50, fill = '█', printEnd = "\r"):
+	fraction = iteration/total if total > 0 else 1		# Nothing to do counts as done
+	percent = ("{0:." + str(decimals) + "f}").format(100 * fraction)
+	filledLength = int(length * fraction)
+	bar = fill * filledLength + '-' * (length - filledLength)
+	print(f'\r{prefix} |{bar}| {percent}% ({iteration}/{total}) {suffix}', end = printEnd)
+	stdout.flush()
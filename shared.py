@@ -0,0 +1,54 @@
+"""
+Places numpy arrays in shared memory, so worker processes can attach to them without pickling or copying.
+"""
+
+import numpy as np
+from multiprocessing import shared_memory
+
+
+"""
+Allocates a shared array of <shape> and <dtype>.
+Returns the shared memory block (to be released by the creator), the array and a descriptor for attachArray.
+"""
+def createArray(shape, dtype=np.float64):
+	dtype = np.dtype(dtype)
+	size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+	shm = shared_memory.SharedMemory(create=True, size=size)
+
+	array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+	descriptor = (shm.name, tuple(shape), dtype.str)
+	return shm, array, descriptor
+
+
+"""
+Copies <array> into shared memory. Returns the shared memory block and a descriptor for attachArray.
+"""
+def shareArray(array):
+	shm, sharedArray, descriptor = createArray(array.shape, array.dtype)
+	sharedArray[...] = array
+	del sharedArray
+	return shm, descriptor
+
+
+"""
+Attaches to the shared array described by <descriptor> without copying it.
+Returns the shared memory block (to be closed once the array is no longer used) and the array.
+"""
+def attachArray(descriptor):
+	name, shape, dtype = descriptor
+	try:
+		shm = shared_memory.SharedMemory(name=name, track=False)		# Only the creator unlinks the block (Python 3.13+)
+	except TypeError:
+		shm = shared_memory.SharedMemory(name=name)					# Worker processes share the creator's resource tracker
+
+	array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+	return shm, array
+
+
+"""
+Closes and unlinks the shared memory blocks created by this process.
+"""
+def releaseArrays(sharedMemory):
+	for shm in sharedMemory:
+		shm.close()
+		shm.unlink()
@@ -1,193 +1,431 @@
 import numpy as np
-from skimage.draw import disk, line as line_, polygon
-
-def renderFrame(args, bins, j):
-	if len(bins) == 1:
-		bins = bins[0]
-		frame = renderMonoChannel(args, bins, j)
-	if len(bins) == 2:
-		frame = renderStereoChannel(args, bins, j)
-	
-	return frame
+from skimage.draw import disk
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
+from types import SimpleNamespace
+
+"""
+Precomputes everything of the rendering that does not depend on the audio: the columns of the bins, the point sprite,
+the radial vectors, the image overlay and the frame buffers that are reused for every frame.
+Built once per process and passed to renderChunk.
+"""
+def createRenderPlan(args):
+	plan = SimpleNamespace()
 
-def renderMonoChannel(args, bins, j):
 	if args.mirror == 0:
-		height = args.height
+		plan.height = args.height
 	else:
-		fullFrame = np.full((args.height, args.width, 3), args.backgroundColor).astype(np.uint8)
-		height = int(args.height/2)
-
-	frame = np.full((height, args.width, 3), args.backgroundColor).astype(np.uint8)
+		plan.height = int(args.height/2)
 
-	if not args.radial:
-		if args.style == "bars" and args.barHeight == -1:
-			for k in range(args.bins):
-				frame[:int(np.ceil(bins[j,k]*height)),
-				int(k/args.bins*args.width + args.binSpacing/2):int((k+1)/args.bins*args.width - args.binSpacing/2)] = args.color
+	plan.backgroundColor = np.array(args.backgroundColor, dtype=np.uint8)
+	plan.color = np.array(args.color, dtype=np.uint8)
+	plan.colorPixel = plan.color.view("V3")[0]								# Single element for pixelView
+	plan.backgroundRow = np.tile(plan.backgroundColor, args.width)				# Pixel row of background color for rowBytes
 
-		if args.style == "bars" and args.barHeight != -1 or args.style == "circles" or args.style == "donuts":
-			point = renderPoint(args)
-			binSpace = height - point.shape[0]
-			
-			for k in range(args.bins):
-				binStart = int(k*args.binWidth + k*args.binSpacing)
-				offset = int(args.binWidth - point.shape[1])
+	binIndices = np.arange(args.bins)
+	plan.columnStarts = (binIndices/args.bins*args.width + args.binSpacing/2).astype(int)
+	plan.columnEnds = ((binIndices+1)/args.bins*args.width - args.binSpacing/2).astype(int)
 
-				frame[int(bins[j,k]*binSpace):int(bins[j,k]*binSpace + point.shape[0]),
-				int(k/args.bins*args.width + args.binSpacing/2):int((k+1)/args.bins*args.width - args.binSpacing/2)] = point
+	if args.radial and args.channel == "stereo":
+		plan.firstColumn = int(args.width/2)										# Only the kept half of each channel's circle is drawn
+	else:
+		plan.firstColumn = 0
 
-		if args.style == "line":
-			binSpace = height - args.lineThickness
-			paddedFrame = np.full((height, args.width + 2*args.lineThickness, 3), args.backgroundColor).astype(np.uint8)
+	plan.batched = not args.radial and (args.style == "bars" and args.barHeight == -1 or args.style == "line" or args.style == "fill") or args.radial and args.style == "line"
 
-			for k in range(args.bins):
-				vector1Y = int(bins[j,k]*binSpace)
+	plan.clearFrames = args.radial or args.style == "bars" and args.barHeight != -1 or args.style == "circles" or args.style == "donuts"
 
-				if k == 0:
-					vector1X = 0
-				else:
-					vector1X = int(k/args.bins*args.width)
+	if not args.radial and (args.style == "bars" and args.barHeight == -1 or args.style == "line" or args.style == "fill"):
+		plan.rowIndices = np.arange(plan.height, dtype=np.int32)[:,np.newaxis]
+		plan.colorDelta = np.tile(plan.color, args.width) - plan.backgroundRow		# Wraps around, background + delta = color
 
-				if k == args.bins - 1:
-					vector2Y = int(bins[j,k]*binSpace)
-					vector2X = frame.shape[1] - 1
-				else:
-					vector2Y = int(bins[j,k+1]*binSpace)
-					vector2X = int((k+1)/args.bins*args.width)
+	if args.style == "bars" and args.barHeight == -1 and not args.radial:
+		plan.byteBins = np.repeat(columnBins(args, plan), 3, axis=-1)				# Bin of every byte of a pixel row
 
-				rr, cc = line_(vector1Y, vector1X, vector2Y, vector2X)
-				for i in range(len(rr)):
-					paddedFrame[rr[i]:int(rr[i]+args.lineThickness), int(cc[i] + 0.5*args.lineThickness):int(cc[i]+ 1.5*args.lineThickness)] = args.color
-			frame = paddedFrame[:,int(args.lineThickness):int(-args.lineThickness)]
+	if args.style == "bars" and args.barHeight != -1 or args.style == "circles" or args.style == "donuts":
+		plan.point = renderPoint(args)
 
-		if args.style == "fill":
-			for k in range(args.bins):
-				vector1Y = np.ceil(bins[j,k]*height)
+	if args.style == "line":
+		plan.lineThickness = int(args.lineThickness)
+		plan.nextBins = np.minimum(binIndices + 1, args.bins - 1)					# The last segment stays at the height of the last bin
 
-				if k == 0:
-					vector1X = 0
-				else:
-					vector1X = int(k/args.bins*args.width)
+	if (args.style == "line" or args.style == "fill") and not args.radial:
+		plan.curveStarts = (binIndices/args.bins*args.width).astype(int)			# Columns of the points of the curve through the bins
+		plan.curveEnds = ((binIndices+1)/args.bins*args.width).astype(int)
+		plan.curveEnds[-1] = args.width - 1
 
-				if k == args.bins - 1:
-					vector2Y = np.ceil(bins[j,k]*height)
-					vector2X = frame.shape[1] - 1
-				else:
-					vector2Y = np.ceil(bins[j,k+1]*height)
-					vector2X = int((k+1)/args.bins*args.width)
+	if args.style == "line" and not args.radial:
+		plan.lineMask = np.empty((plan.height, args.width*3), dtype=bool)
 
-				r = [vector1Y, vector2Y, 0, 0]
-				c = [vector1X, vector2X, vector2X, vector1X]
-				rr, cc = polygon(r, c, frame.shape)
-				frame[rr, cc] = args.color
+	if args.style == "fill" and not args.radial:
+		columns = np.arange(args.width)
+		plan.fillBins = np.searchsorted(plan.curveStarts, columns, side="right") - 1	# Bin of the curve segment above every column
+		plan.fillNextBins = np.minimum(plan.fillBins + 1, args.bins - 1)				# The last segment stays at the height of the last bin
+		plan.fillOffsets = columns - plan.curveStarts[plan.fillBins]
+		plan.fillSpans = np.maximum(plan.curveEnds[plan.fillBins] - plan.curveStarts[plan.fillBins], 1)
 
 	if args.radial:
-		midHeight = int(height/2)
-		midWidth = int(args.width/2)
-		maxVectorLength = args.radiusEnd - args.radiusStart
-
-		if args.style == "bars":
-			for k in range(args.bins):
-				angleStart = k/args.bins + (args.binSpacing/2)/args.width
-				angleEnd = (k+1)/args.bins + (-args.binSpacing/2)/args.width
-
-				vector1Y = int(midHeight + args.radiusStart * radialVectorY(args, angleStart))
-				vector1X = int(midWidth + args.radiusStart * radialVectorX(args, angleStart))
-				vector2Y = int(midHeight + (args.radiusStart + bins[j,k] * maxVectorLength) * radialVectorY(args, angleStart))
-				vector2X = int(midWidth + (args.radiusStart + bins[j,k]*maxVectorLength) * radialVectorX(args, angleStart))
-
-				vector3Y = int(midHeight + (args.radiusStart + bins[j,k]*maxVectorLength) * radialVectorY(args, angleEnd))
-				vector3X = int(midWidth + (args.radiusStart + bins[j,k]*maxVectorLength) * radialVectorX(args, angleEnd))
-				vector4Y = int(midHeight + args.radiusStart * radialVectorY(args, angleEnd))
-				vector4X = int(midWidth + args.radiusStart * radialVectorX(args, angleEnd))
-
-				r = [vector1Y, vector2Y, vector3Y, vector4Y]
-				c = [vector1X, vector2X, vector3X, vector4X]
-				rr, cc = polygon(r, c, frame.shape)
-				frame[rr, cc] = args.color
+		if args.style == "bars" or args.style == "fill":
+			polarMap(args, plan)
 
 		if args.style == "line":
-			for k in range(args.bins):
-				angleStart = k/args.bins
-				angleEnd = (k+1)/args.bins
-
-				vector1Y = int(midHeight + (args.radiusStart + bins[j,k] * maxVectorLength) * radialVectorY(args, angleStart) - 1)
-				vector1X = int(midWidth + (args.radiusStart + bins[j,k]*maxVectorLength) * radialVectorX(args, angleStart) - 1)
-
-				if k == args.bins - 1:
-					k = k - 1
-
-				vector2Y = int(midHeight + (args.radiusStart + bins[j,k+1]*maxVectorLength) * radialVectorY(args, angleEnd) - 1)
-				vector2X = int(midWidth + (args.radiusStart + bins[j,k+1]*maxVectorLength) * radialVectorX(args, angleEnd) - 1)
-
-				rr, cc = line_(vector1Y, vector1X, vector2Y, vector2X)
-
-				for i in range(len(rr)):
-					frame[rr[i]:int(rr[i]+args.lineThickness), int(cc[i] + 0.5*args.lineThickness):int(cc[i]+ 1.5*args.lineThickness)] = args.color
-
-		if args.style == "fill":
-			for k in range(args.bins):
-				angleStart = k/args.bins
-				angleEnd = (k+1)/args.bins
+			angleStarts = binIndices/args.bins
+			angleEnds = (binIndices+1)/args.bins
+			plan.startVectorY = radialVectorY(args, angleStarts)
+			plan.startVectorX = radialVectorX(args, angleStarts)
+			plan.endVectorY = radialVectorY(args, angleEnds)
+			plan.endVectorX = radialVectorX(args, angleEnds)
 
-				vector1Y = int(midHeight + args.radiusStart * radialVectorY(args, angleStart))
-				vector1X = int(midWidth + args.radiusStart * radialVectorX(args, angleStart))
-				vector2Y = int(midHeight + (args.radiusStart + bins[j,k] * maxVectorLength) * radialVectorY(args, angleStart))
-				vector2X = int(midWidth + (args.radiusStart + bins[j,k]*maxVectorLength) * radialVectorX(args, angleStart))
-
-				if k == args.bins - 1:
-					k = k - 1
-
-				vector3Y = int(midHeight + (args.radiusStart + bins[j,k+1]*maxVectorLength) * radialVectorY(args, angleEnd))
-				vector3X = int(midWidth + (args.radiusStart + bins[j,k+1]*maxVectorLength) * radialVectorX(args, angleEnd))
-				vector4Y = int(midHeight + args.radiusStart * radialVectorY(args, angleEnd))
-				vector4X = int(midWidth + args.radiusStart * radialVectorX(args, angleEnd))
-
-				r = [vector1Y, vector2Y, vector3Y, vector4Y]
-				c = [vector1X, vector2X, vector3X, vector4X]
-				rr, cc = polygon(r, c, frame.shape)
-				frame[rr, cc] = args.color
+		if args.image:
+			plan.imagePixels = args.radialImage[args.radialImageMask,:3]
+
+	plan.channelSlices = channelSlices(args, plan)
+
+	plan.frames = np.empty((0, args.height, args.width, 3), dtype=np.uint8)
+
+	return plan
+
+"""
+Returns a buffer for <numFrames> frames. The buffer is reused, so its frames are overwritten by the next call.
+"""
+def frameBuffer(args, plan, numFrames):
+	if len(plan.frames) < numFrames:
+		plan.frames = np.empty((numFrames, args.height, args.width, 3), dtype=np.uint8)
+	return plan.frames[:numFrames]
+
+"""
+Maps every pixel column to the bin drawn in it, or -1 for the spacing between bins.
+Returns an array of shape (layers, width). There is more than one layer only if bins overlap (negative bin spacing).
+"""
+def columnBins(args, plan):
+	columns = np.arange(args.width)
+	columnRanges = np.array([slice(start, end).indices(args.width)[:2] for start, end in zip(plan.columnStarts, plan.columnEnds)]).reshape(-1, 2)	# Same columns as slicing the frame
+	coverage = (columns >= columnRanges[:,0:1]) & (columns < columnRanges[:,1:2])		# (bins, width)
+	numLayers = max(int(np.max(np.sum(coverage, axis=0), initial=0)), 1)
+	rank = np.cumsum(coverage, axis=0)
+
+	binMap = np.full((numLayers, args.width), -1)
+	for layer in range(numLayers):
+		inLayer = coverage & (rank == layer + 1)
+		binMap[layer] = np.where(np.any(inLayer, axis=0), np.argmax(inLayer, axis=0), -1)
+	return binMap
+
+"""
+Precomputes the polar coordinates of the pixels between the start and end radius for the radial bars and fill styles:
+their row and column, the bin whose angle they lie in and their radius, normalized so the start radius is 0 and the end radius 1.
+A pixel is drawn if its radius is not bigger than the height of its bin, so frames are drawn without any trigonometry or polygons.
+For fill, the edge is the straight chord between the ends of the bin and the next bin. The sines of the angle of every pixel to both ends
+of its bin are precomputed for it, and its radius is measured from the center in units of the normalized radius.
+"""
+def polarMap(args, plan):
+	rows, columns = np.indices((plan.height, args.width))
+	offsetY = rows - int(plan.height/2)
+	offsetX = columns - int(args.width/2)
+	radius = (np.hypot(offsetY, offsetX) - args.radiusStart)/(args.radiusEnd - args.radiusStart)
+	inRing = (radius >= 0) & (radius <= 1) & (columns >= plan.firstColumn)
+
+	circumference = args.circumference
+	if circumference == 0:											# Nothing is drawn
+		inRing[:] = False
+		circumference = 1
+
+	rows, columns, radius = rows[inRing], columns[inRing], radius[inRing]
+	turn = np.arctan2(offsetX[inRing], offsetY[inRing])/(2*np.pi)				# Same orientation as radialVectorY/radialVectorX
+	position = np.mod(turn - args.rotation, 1)/circumference*args.bins		# Angle in bins, starting at the rotation
 
-	frame = np.flipud(frame)
+	if args.style == "bars":
+		gap = args.binSpacing/2/args.width*args.bins						# Bin spacing in bins, negative if bins overlap
+	else:
+		gap = 0
+	overlap = int(np.ceil(max(-gap, 0)))
+	turnBins = args.bins/circumference							# Bins per full turn
+
+	polarRows, polarColumns, polarRadius, polarBins, polarWeights = [], [], [], [], []
+	for shift in (-turnBins, 0, turnBins):								# Bins reaching over the start of a full turn
+		shifted = position - shift
+		for offset in range(-overlap, overlap + 1):
+			k = np.floor(shifted).astype(int) + offset
+			inBin = (k >= 0) & (k < args.bins) & (shifted >= k + gap) & (shifted < k + 1 - gap)
+
+			polarRows.append(rows[inBin])
+			polarColumns.append(columns[inBin])
+			polarRadius.append(radius[inBin])
+			polarBins.append(k[inBin])
+			polarWeights.append(shifted[inBin] - k[inBin])
+
+	plan.polarRows = np.concatenate(polarRows)
+	plan.polarColumns = np.concatenate(polarColumns)
+	plan.polarRadius = np.concatenate(polarRadius).astype(np.float32)
+	plan.polarBins = np.concatenate(polarBins)
+	plan.polarNextBins = np.minimum(plan.polarBins + 1, args.bins - 1)			# The last bin is not interpolated
+	plan.polarWeights = np.concatenate(polarWeights).astype(np.float32)
+
+	if args.style == "fill":
+		binAngle = 2*np.pi*circumference/args.bins
+		plan.radiusOffset = args.radiusStart/(args.radiusEnd - args.radiusStart)		# Start radius in units of the normalized radius
+		plan.polarRadius += plan.radiusOffset
+		plan.polarSinStart = np.sin(binAngle*(1 - plan.polarWeights)).astype(np.float32)	# Sine of the angle to the end of the bin, weighs the start height
+		plan.polarSinEnd = np.sin(binAngle*plan.polarWeights).astype(np.float32)			# Sine of the angle to the start of the bin, weighs the end height
+		plan.sinBinAngle = np.float32(np.sin(binAngle))
+
+"""
+Renders the frames <start> to <end> into <frames>, or into a reused frame buffer if <frames> is None, and returns them.
+Styles with a batched renderer are rendered for many frames at once, all others frame by frame.
+"""
+def renderChunk(args, plan, bins, start, end, frames=None):
+	frames = frameBuffer(args, plan, end - start) if frames is None else frames[:end - start]
+	if plan.clearFrames:
+		rowBytes(frames)[:] = plan.backgroundRow
+
+	for channel in range(len(bins)):
+		channelFrames = channelView(plan, frames, channel)
+		if plan.batched:
+			renderChannelBatch(args, plan, bins[channel,start:end], channelFrames)
+		else:
+			for j in range(start, end):
+				renderChannel(args, plan, bins[channel], j, channelFrames[j - start])
+
+	finishFrames(args, plan, frames)
+	return frames
+
+"""
+Returns the rows and columns of the frame that every channel is drawn into, as slices. Bins are drawn from the bottom up,
+the flip to image orientation is done by writing into a flipped view of the frame.
+Stereo channels are drawn straight into their half of the frame: the upper and lower half, or for radial the left and right half of the circle.
+"""
+def channelSlices(args, plan):
+	height = plan.height
+	columns = slice(None)
 
 	if args.channel != "stereo":
-		if args.mirror == 1:
-			fullFrame[:frame.shape[0],:] = frame
-			fullFrame[frame.shape[0]:frame.shape[0]*2,:] = np.flipud(frame)
-			frame = fullFrame
+		if args.mirror == 0:
+			return [(slice(None, None, -1), columns)]
+		elif args.mirror == 1:
+			return [(slice(height-1, None, -1), columns)]
+		else:
+			return [(slice(0, height), columns)]
 
-		elif args.mirror == 2:
-			fullFrame[:frame.shape[0],:] = np.flipud(frame)
-			fullFrame[frame.shape[0]:frame.shape[0]*2,:] = frame
-			frame = fullFrame
+	if args.radial:
+		return [(slice(None, None, -1), slice(None, None, -1)), (slice(None, None, -1), columns)]		# Left half is the mirrored right half of the first channel
+	elif args.mirror == 1:
+		return [(slice(height-1, None, -1), columns), (slice(height, height*2), columns)]
+	else:
+		return [(slice(0, height), columns), (slice(height*2-1, height-1, -1), columns)]
+
+"""
+Returns the view of <frame> (or of a batch of frames) that <channel> is drawn into.
+"""
+def channelView(plan, frame, channel):
+	rows, columns = plan.channelSlices[channel]
+	return frame[...,rows,columns,:]
+
+"""
+Mirrors the drawn half of <frame> (or of a batch of frames), clears the rows that are not drawn and adds the image overlay.
+"""
+def finishFrames(args, plan, frame):
+	if args.mirror != 0:
+		if args.channel != "stereo":
+			frame[...,plan.height:plan.height*2,:,:] = frame[...,plan.height-1::-1,:,:]
+		rowBytes(frame[...,plan.height*2:,:,:])[:] = plan.backgroundRow
+
+	if args.image and args.radial:
+		frame[...,args.frameMask,:] = plan.imagePixels
+
+"""
+Returns a view of <frames> (..., rows, width, 3) as rows of bytes (..., rows, width*3), so operations run over whole pixel rows.
+"""
+def rowBytes(frames):
+	shape = frames.shape[:-2] + (frames.shape[-2]*3,)
+	strides = frames.strides[:-2] + (frames.strides[-1],)
+	return as_strided(frames, shape, strides)
+
+"""
+Returns a view of <frames> (..., width, 3) with a single element per pixel, so setting pixels by fancy indexing writes all three bytes at once.
+"""
+def pixelView(frames):
+	return frames.view("V3")[...,0]
+
+"""
+Draws a batch of frames of a single channel with the batched renderer of the style. <bins> has the shape (frames, bins).
+"""
+def renderChannelBatch(args, plan, bins, frames):
+	if not args.radial:
+		if args.style == "bars":
+			renderBarsBatch(args, plan, bins, frames)
+		if args.style == "line":
+			renderLineBatch(args, plan, bins, frames)
+		if args.style == "fill":
+			renderFillBatch(args, plan, bins, frames)
+	else:
+		renderRadialLineBatch(args, plan, bins, frames)
+
+"""
+Turns <pixelRows> (see rowBytes), into which a mask was written, into the bar color where the mask is set and the background color elsewhere.
+"""
+def paintMask(plan, pixelRows):
+	pixelRows *= plan.colorDelta
+	pixelRows += plan.backgroundRow
+
+"""
+Rasterizes the line segments from (<rows1>, <columns1>) to (<rows2>, <columns2>) all at once, with the same pixels as skimage.draw.line.
+Returns the segment, row and column of every pixel, ordered by segment and from the start to the end of each segment.
+"""
+def lineSegments(rows1, columns1, rows2, columns2):
+	deltaRows = rows2 - rows1
+	deltaColumns = columns2 - columns1
+	steep = np.abs(deltaRows) > np.abs(deltaColumns)
+	major = np.maximum(np.abs(deltaRows), np.abs(deltaColumns))
+	minor = np.minimum(np.abs(deltaRows), np.abs(deltaColumns))
+
+	lengths = major + 1
+	segments = np.repeat(np.arange(len(lengths)), lengths)
+	steps = np.arange(len(segments)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+	minorSteps = (2*minor[segments]*steps + major[segments]) // np.maximum(2*major[segments], 1)		# Closed form of Bresenham's error term
+
+	rowSteps = np.where(steep[segments], steps, minorSteps)
+	columnSteps = np.where(steep[segments], minorSteps, steps)
+	rows = rows1[segments] + np.where(deltaRows[segments] > 0, rowSteps, -rowSteps)
+	columns = columns1[segments] + np.where(deltaColumns[segments] > 0, columnSteps, -columnSteps)
+	return segments, rows, columns
+
+"""
+Draws the line style for a batch of frames into <frames> of shape (frames, plan.height, width, 3), with row 0 being the bottom.
+<bins> has the shape (frames, bins).
+A line pixel is drawn as a square of lineThickness, so every column is covered by a single range of rows: from the lowest to the highest
+line pixel in the columns whose squares reach it. These ranges are turned into pixels like the bars.
+"""
+def renderLineBatch(args, plan, bins, frames):
+	numFrames = len(bins)
+	lineThickness = plan.lineThickness
+
+	heights = (bins*(plan.height - lineThickness)).astype(int)
+	startColumns = np.broadcast_to(plan.curveStarts, heights.shape).ravel()
+	endColumns = np.broadcast_to(plan.curveEnds, heights.shape).ravel()
+	segments, rows, columns = lineSegments(heights.ravel(), startColumns, heights[:,plan.nextBins].ravel(), endColumns)
+
+	keys = segments//args.bins*args.width + columns								# Sorted, the line runs from left to right through every column
+	columnStarts = np.flatnonzero(np.diff(keys, prepend=-1))
+	lowest = np.full((numFrames, args.width + 2*lineThickness), plan.height)
+	highest = np.zeros((numFrames, args.width + 2*lineThickness), dtype=int)
+	lowest[:,lineThickness:-lineThickness] = np.minimum.reduceat(rows, columnStarts).reshape(numFrames, args.width)
+	highest[:,lineThickness:-lineThickness] = np.maximum.reduceat(rows, columnStarts).reshape(numFrames, args.width) + lineThickness
+
+	first = lineThickness + 1 - lineThickness//2								# Squares reach from int(column - lineThickness/2) to the left
+	lowest = sliding_window_view(lowest, lineThickness, axis=1)[:,first:first+args.width].min(axis=-1)
+	highest = sliding_window_view(highest, lineThickness, axis=1)[:,first:first+args.width].max(axis=-1)
+	lowest = np.minimum(lowest, highest)											# Empty columns at the edges
+	byteLowest = np.repeat(lowest, 3, axis=-1)
+	byteHighest = np.repeat(highest, 3, axis=-1)
+
+	pixelRows = rowBytes(frames)
+	mask = pixelRows.view(bool)
+	for i in range(numFrames):
+		np.less(plan.rowIndices, byteHighest[i], out=mask[i])
+		np.less(plan.rowIndices, byteLowest[i], out=plan.lineMask)
+		np.logical_xor(mask[i], plan.lineMask, out=mask[i])					# Below the highest but not below the lowest row
+	paintMask(plan, pixelRows)
+
+"""
+Draws the radial line style for a batch of frames onto <frames> of shape (frames, plan.height, width, 3), with row 0 being the bottom.
+<bins> has the shape (frames, bins). Every line pixel is drawn as a square of lineThickness.
+"""
+def renderRadialLineBatch(args, plan, bins, frames):
+	midHeight = int(plan.height/2)
+	midWidth = int(args.width/2)
+	radii = args.radiusStart + bins*(args.radiusEnd - args.radiusStart)
+	nextRadii = radii[:,plan.nextBins]
+
+	rows1 = (midHeight + radii*plan.startVectorY - 1).astype(int)
+	columns1 = (midWidth + radii*plan.startVectorX - 1).astype(int)
+	rows2 = (midHeight + nextRadii*plan.endVectorY - 1).astype(int)
+	columns2 = (midWidth + nextRadii*plan.endVectorX - 1).astype(int)
+	segments, rows, columns = lineSegments(rows1.ravel(), columns1.ravel(), rows2.ravel(), columns2.ravel())
+
+	lineThickness = plan.lineThickness
+	squareRows, squareColumns = np.mgrid[0:lineThickness, lineThickness//2:lineThickness//2 + lineThickness]
+	rows = (rows[:,np.newaxis] + squareRows.ravel()).ravel()
+	columns = (columns[:,np.newaxis] + squareColumns.ravel()).ravel()
+	frameIndices = np.repeat(segments//args.bins, lineThickness**2)
+
+	inFrame = (rows >= 0) & (rows < plan.height) & (columns >= plan.firstColumn) & (columns < args.width)
+	pixelView(frames)[frameIndices[inFrame], rows[inFrame], columns[inFrame]] = plan.colorPixel
+
+"""
+Draws full height bars for a batch of frames into <frames> of shape (frames, plan.height, width, 3), with row 0 being the bottom.
+<bins> has the shape (frames, bins).
+Every byte is compared against the height of the bar in its column, the resulting mask is turned into colors in place.
+"""
+def renderBarsBatch(args, plan, bins, frames):
+	barHeights = np.zeros((len(bins), args.bins + 1), dtype=np.int32)			# Last column stays 0 for the spacing between bins
+	barHeights[:,:-1] = np.ceil(bins*plan.height)
+
+	byteHeights = np.take(barHeights, plan.byteBins[0], axis=1)				# take keeps the rows contiguous, which the comparison below relies on for speed
+	for layer in plan.byteBins[1:]:
+		np.maximum(byteHeights, np.take(barHeights, layer, axis=1), out=byteHeights)
+
+	fillColumns(plan, byteHeights, frames)
+
+"""
+Draws the fill style for a batch of frames into <frames> of shape (frames, plan.height, width, 3), with row 0 being the bottom.
+<bins> has the shape (frames, bins).
+The height of every column is interpolated between the two bins of the curve segment above it, then the columns are filled like bars.
+"""
+def renderFillBatch(args, plan, bins, frames):
+	heights = np.ceil(bins*plan.height).astype(int)
+	startHeights = heights[:,plan.fillBins]
+	endHeights = heights[:,plan.fillNextBins]
+
+	columnHeights = (startHeights*plan.fillSpans + (endHeights - startHeights)*plan.fillOffsets)//plan.fillSpans + 1	# Rows up to and including the curve
+	columnHeights[(startHeights == 0) & (endHeights == 0)] = 0					# Segments without area are not drawn
+	fillColumns(plan, np.repeat(columnHeights.astype(np.int32), 3, axis=-1), frames)
+
+"""
+Fills every byte column of <frames> (see rowBytes) from the bottom up to the height given in <byteHeights> of shape (frames, width*3)
+with the bar color and the rest with the background color.
+"""
+def fillColumns(plan, byteHeights, frames):
+	pixelRows = rowBytes(frames)
+	np.less(plan.rowIndices, byteHeights[:,np.newaxis,:], out=pixelRows.view(bool))
+	paintMask(plan, pixelRows)
+
+"""
+Draws the bins of a single channel of frame <j> into <frame> of shape (plan.height, width, 3), with row 0 being the bottom.
+Styles that do not cover the whole frame are drawn onto the background, which is already set.
+"""
+def renderChannel(args, plan, bins, j, frame):
+	height = plan.height
 
-		if args.image and args.radial:
-			frame[args.frameMask] = args.radialImage[args.radialImageMask,:3]
+	if not args.radial:
+		if args.style == "bars" and args.barHeight == -1:
+			renderBarsBatch(args, plan, bins[j:j+1], frame[np.newaxis])
 
-	return frame
+		if args.style == "bars" and args.barHeight != -1 or args.style == "circles" or args.style == "donuts":
+			point = plan.point
+			binSpace = height - point.shape[0]
 
-def renderStereoChannel(args, bins, j):
-	left = bins[0]
-	right = bins[1]
-	frame = np.full((args.height, args.width, 3), args.backgroundColor).astype(np.uint8)
+			for k in range(args.bins):
+				frame[int(bins[j,k]*binSpace):int(bins[j,k]*binSpace + point.shape[0]),
+				plan.columnStarts[k]:plan.columnEnds[k]] = point
 
-	frame1 = renderMonoChannel(args, left, j)
-	frame2 = renderMonoChannel(args, right, j)
+		if args.style == "line":
+			renderLineBatch(args, plan, bins[j:j+1], frame[np.newaxis])
 
-	if args.mirror == 1:
-		frame[:frame1.shape[0],:] = frame1
-		frame[frame2.shape[0]:frame2.shape[0]*2,:] = np.flipud(frame2)
+		if args.style == "fill":
+			renderFillBatch(args, plan, bins[j:j+1], frame[np.newaxis])
 
-	elif args.mirror == 2:
-		frame[:frame1.shape[0],:] = np.flipud(frame1)
-		frame[frame2.shape[0]:frame.shape[0]*2,:] = frame2
-	
 	if args.radial:
-		frame[:,:int(frame1.shape[1]/2)] = np.fliplr(frame1[:,int(frame1.shape[1]/2):])
-		frame[:,int(frame2.shape[1]/2):] = frame2[:,int(frame2.shape[1]/2):]
+		if args.style == "bars":
+			filled = plan.polarRadius <= bins[j,plan.polarBins]
+			pixelView(frame)[plan.polarRows[filled], plan.polarColumns[filled]] = plan.colorPixel
 
-		if args.image:
-			frame[args.frameMask] = args.radialImage[args.radialImageMask,:3]
+		if args.style == "line":
+			renderRadialLineBatch(args, plan, bins[j:j+1], frame[np.newaxis])
+
+		if args.style == "fill":
+			# Below the chord from the end of the bin to the end of the next bin: radius < r1*r2*sin(bin angle) / (r1*sin(angle) + r2*sin(bin angle - angle))
+			startRadii = bins[j,plan.polarBins] + plan.radiusOffset
+			endRadii = bins[j,plan.polarNextBins] + plan.radiusOffset
+			filled = plan.polarRadius*(startRadii*plan.polarSinEnd + endRadii*plan.polarSinStart) < startRadii*endRadii*plan.sinBinAngle
+			pixelView(frame)[plan.polarRows[filled], plan.polarColumns[filled]] = plan.colorPixel
 
 	return frame
 
@@ -215,4 +453,4 @@ def radialVectorY(args, angle):
 
 def radialVectorX(args, angle):
 	vector = np.sin(2*np.pi * (angle * args.circumference + args.rotation))
-	return vector
\ No newline at end of file
+	return vector